@@ -0,0 +1,172 @@
+## Python standard
+import os
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+## local
+from video_exporter import RESOLUTIONS
+from sequence_scan import list_sequence, name_filter, natural_key, parse_frame_range
+from timeline import Timeline
+
+app = None
+
+def init_worker():
+	## each render process gets its own headless Qt; no widgets are ever made
+	global app
+	os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+	
+	from PySide6.QtGui import QGuiApplication
+	app = QGuiApplication.instance() or QGuiApplication([])
+
+def render_shot(image_files, output_filename, width, height, fps, framehold, segments = 1, timeline = None):
+	## the same compose and encode path the Save Video button uses
+	from PySide6.QtGui import QImageReader
+	from video_exporter import write_video
+
+	## the GUI shows an unreadable drawing as a black frame; a batch render
+	## fails the shot instead so it doesn't go out with holes in it
+	unreadable = [image_path for image_path in image_files if not QImageReader(image_path).canRead()]
+	
+	if unreadable:
+		raise IOError(f"{len(unreadable)} unreadable image(s), starting with {unreadable[0]}")
+
+	start_time = time.monotonic()
+	started_at = time.time()
+
+	try:
+		if segments > 1:
+			from segment_export import write_segmented_video
+			write_segmented_video(image_files, output_filename, width, height, fps, framehold, segments,
+								timeline = timeline)
+		else:
+			write_video(image_files, output_filename, width, height, fps, framehold, timeline = timeline)
+	except Exception:
+		## a failed shot leaves no partial video behind; a file from an
+		## earlier render that this one never got to write is left alone
+		try:
+			if os.path.getmtime(output_filename) >= started_at:
+				os.remove(output_filename)
+		except OSError:
+			pass
+
+		raise
+
+	return time.monotonic() - start_time
+
+def find_shots(sources, pattern = None, frame_range = None):
+	## each folder is one shot; files matched by a glob are grouped by folder;
+	## pattern and frame_range pick which files in a folder make up the shot
+	shots = {}
+	accept = name_filter(pattern, frame_range)
+
+	for source in sources:
+		matches = glob.glob(source) or [source]
+
+		for match in sorted(matches):
+			if os.path.isdir(match):
+				files = list_sequence(match, pattern, frame_range)
+				folder = match
+			else:
+				files = [match] if accept(os.path.basename(match)) else []
+				folder = os.path.dirname(match)
+
+			shots.setdefault(os.path.abspath(folder), set()).update(files)
+
+	return {folder: sorted(files, key = natural_key) for folder, files in shots.items() if files}
+
+def parse_hold(text):
+	## "12=4" holds the 12th drawing of a shot for 4 frames
+	frame, _, hold = text.partition("=")
+
+	if not frame.isdigit() or not hold.isdigit() or int(frame) < 1 or int(hold) < 1:
+		raise argparse.ArgumentTypeError(f"expected FRAME=HOLD, e.g. 12=4, not {text!r}")
+
+	return int(frame), int(hold)
+
+def shot_timeline(frame_count, framehold, direction, loops, holds):
+	## holds are numbered from 1 in the shot's own order
+	holds = {frame - 1: hold for frame, hold in holds if frame <= frame_count}
+	return Timeline(frame_count, framehold, holds, [(0, frame_count - 1, direction, loops)])
+
+def available_cores():
+	if hasattr(os, "sched_getaffinity"):
+		return len(os.sched_getaffinity(0))
+	return os.cpu_count() or 1
+
+def parse_args(argv):
+	parser = argparse.ArgumentParser(prog = "main.py render",
+								description = "Render image sequences to MP4 without the GUI.")
+	parser.add_argument("sources", nargs = "+", help = "shot folders or glob patterns")
+	parser.add_argument("--fps", type = int, default = 24, choices = [18, 24, 30])
+	parser.add_argument("--resolution", default = "1080p", choices = list(RESOLUTIONS))
+	parser.add_argument("--framehold", type = int, default = 1, choices = range(1, 10), metavar = "1-9")
+	parser.add_argument("--direction", default = "forward", choices = ["forward", "reverse", "bounce"])
+	parser.add_argument("--loops", type = int, default = 1, help = "play the shot this many times over (default: 1)")
+	parser.add_argument("--hold", type = parse_hold, action = "append", default = [], metavar = "FRAME=HOLD",
+					help = "hold one drawing for its own number of frames (e.g. 12=4); may be repeated")
+	parser.add_argument("--output-dir", help = "where to write the videos (default: next to each shot folder)")
+	parser.add_argument("--jobs", type = int, default = available_cores(),
+					help = "shots rendered at the same time (default: available cores)")
+	parser.add_argument("--pattern", help = "only files matching this, # for each frame number digit (e.g. shot_####.tif)")
+	parser.add_argument("--frames", type = parse_frame_range, metavar = "FIRST-LAST",
+					help = "only this range of frame numbers (e.g. 100-400)")
+	parser.add_argument("--segments", type = int, default = 1,
+					help = "split each shot into this many pieces encoded in parallel (default: 1)")
+	return parser.parse_args(argv)
+
+def main(argv = None):
+	args = parse_args(sys.argv[1:] if argv is None else argv)
+	shots = find_shots(args.sources, args.pattern, args.frames)
+
+	if not shots:
+		print("No image sequences found.", file = sys.stderr)
+		return 1
+
+	width, height = RESOLUTIONS[args.resolution]
+	failures = 0
+
+	## videos are named after their folders, so with --output-dir two shots
+	## in folders of the same name would write over each other
+	output_filenames = {folder: os.path.join(args.output_dir or os.path.dirname(folder),
+											os.path.basename(folder) + ".mp4")
+						for folder in shots}
+	folders_by_output = {}
+
+	for folder, output_filename in output_filenames.items():
+		folders_by_output.setdefault(os.path.normcase(os.path.abspath(output_filename)), []).append(folder)
+
+	collisions = [folders for folders in folders_by_output.values() if len(folders) > 1]
+
+	for folders in collisions:
+		print(f"Shots would write the same video: {', '.join(folders)}", file = sys.stderr)
+
+	if collisions:
+		return 1
+
+	with ProcessPoolExecutor(max_workers = max(1, min(args.jobs, len(shots))), initializer = init_worker) as pool:
+		futures = {}
+
+		for folder, image_files in shots.items():
+			timeline = shot_timeline(len(image_files), args.framehold, args.direction, max(1, args.loops), args.hold)
+			output_filename = output_filenames[folder]
+			future = pool.submit(render_shot, image_files, output_filename, width, height, args.fps, args.framehold,
+								args.segments, timeline)
+			futures[future] = output_filename
+
+		for future in as_completed(futures):
+			output_filename = futures[future]
+
+			try:
+				seconds = future.result()
+				print(f"ok      {output_filename} ({seconds:.1f} s)")
+			except Exception as e:
+				failures += 1
+				print(f"FAILED  {output_filename}: {e}", file = sys.stderr)
+
+	return 1 if failures else 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,439 @@
+## Python standard
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+## PySide6
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage, QPainter, QPixmap
+
+## local
+from frame_composer import compose_frame, compose_image, decode_image, IMAGE_EXTENSIONS
+from frame_buffer import frame_array, rgba_image
+from frame_store import FrameStore
+from image_display import ImageDisplay
+from image_list import ImageList
+from video_exporter import write_video, RESOLUTIONS
+
+BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+
+## source shapes for the synthetic sequences: pillarboxed, letterboxed and exact 16:9
+ASPECT_RATIOS = [4 / 3, 16 / 9, 2.39, 1.0, 9 / 16]
+
+## the decode stage runs on JPEGs the size of a letter page scanned at 600 dpi
+SCAN_SIZE = (5100, 6600)
+
+## run in a fresh interpreter so imports are really paid for; main_window
+## takes over stdout, so the result goes to the original one
+STARTUP_SCRIPT = """
+import time
+start_time = time.perf_counter()
+import sys, json
+from PySide6.QtWidgets import QApplication
+from main_window import MainWindow
+app = QApplication([])
+window = MainWindow()
+window.show()
+app.processEvents()
+elapsed = time.perf_counter() - start_time
+heavy = [name for name in ("moviepy", "numpy", "imageio") if name in sys.modules]
+sys.__stdout__.write(json.dumps({"seconds": elapsed, "heavy_imports": heavy}))
+"""
+
+class RssSampler:
+	## samples resident memory on a thread while a stage runs; ru_maxrss
+	## only ever gives the peak for the whole process
+	def __init__(self, interval = 0.01):
+		self.interval = interval
+		self.peak = 0
+		self.running = False
+		self.thread = None
+
+	def current_rss(self):
+		try:
+			with open("/proc/self/statm") as statm:
+				return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+		except (OSError, ValueError, AttributeError):
+			pass
+
+		try:
+			import resource
+			peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+			return peak if sys.platform == "darwin" else peak * 1024
+		except ImportError:
+			return 0
+
+	def sample(self):
+		while self.running:
+			self.peak = max(self.peak, self.current_rss())
+			time.sleep(self.interval)
+
+	def __enter__(self):
+		self.peak = self.current_rss()
+		self.running = True
+		self.thread = threading.Thread(target = self.sample, daemon = True)
+		self.thread.start()
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.running = False
+		self.thread.join()
+		self.peak = max(self.peak, self.current_rss())
+
+def percentile(values, fraction):
+	values = sorted(values)
+	
+	if not values:
+		return 0.0
+	
+	position = (len(values) - 1) * fraction
+	lower = int(position)
+	upper = min(lower + 1, len(values) - 1)
+	return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def summarize(latencies, elapsed, peak_rss):
+	return {
+		"frames": len(latencies),
+		"fps": len(latencies) / elapsed if elapsed else 0.0,
+		"latency_ms": {
+			"p50": percentile(latencies, 0.5) * 1000,
+			"p90": percentile(latencies, 0.9) * 1000,
+			"p99": percentile(latencies, 0.99) * 1000,
+			"max": max(latencies, default = 0.0) * 1000
+		},
+		"peak_rss_mb": peak_rss / (1024 * 1024)
+	}
+
+def make_synthetic_sequence(folder, width, height, frame_count, extension = "png"):
+	## line-art-ish frames in a mix of aspect ratios, each sized to fill
+	## the target resolution along its long side
+	os.makedirs(folder, exist_ok = True)
+	image_files = []
+
+	for i in range(frame_count):
+		ratio = ASPECT_RATIOS[i % len(ASPECT_RATIOS)]
+
+		if ratio >= width / height:
+			image_width, image_height = width, max(1, round(width / ratio))
+		else:
+			image_width, image_height = max(1, round(height * ratio)), height
+
+		image = QImage(image_width, image_height, QImage.Format_RGB32)
+		image.fill(Qt.white)
+		painter = QPainter(image)
+		painter.setPen(Qt.black)
+		step = max(8, image_width // 40)
+
+		for x in range((i * 7) % step, image_width, step):
+			painter.drawLine(x, 0, image_width - x, image_height)
+
+		painter.end()
+		image_path = os.path.join(folder, f"frame_{i:04d}.{extension}")
+		image.save(image_path)
+		image_files.append(image_path)
+
+	return image_files
+
+def bundled_sequence():
+	folder = os.path.join(BASE_PATH, "sequence")
+	return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+				if name.lower().endswith(IMAGE_EXTENSIONS))
+
+def bench_compose(image_files, width, height):
+	latencies = []
+
+	with RssSampler() as rss:
+		start_time = time.perf_counter()
+
+		for image_path in image_files:
+			frame_start = time.perf_counter()
+			compose_frame(image_path, width, height)
+			latencies.append(time.perf_counter() - frame_start)
+
+		elapsed = time.perf_counter() - start_time
+
+	return summarize(latencies, elapsed, rss.peak)
+
+def bench_decode(image_files, width, height):
+	## large scans decoded at a reduced size for the frame against the same
+	## scans decoded in full, each then composed to the frame
+	full_latencies = []
+
+	for image_path in image_files:
+		frame_start = time.perf_counter()
+		compose_image(decode_image(image_path)[0], width, height)
+		full_latencies.append(time.perf_counter() - frame_start)
+
+	latencies = []
+
+	with RssSampler() as rss:
+		start_time = time.perf_counter()
+
+		for image_path in image_files:
+			frame_start = time.perf_counter()
+			compose_image(decode_image(image_path, width, height)[0], width, height)
+			latencies.append(time.perf_counter() - frame_start)
+
+		elapsed = time.perf_counter() - start_time
+
+	result = summarize(latencies, elapsed, rss.peak)
+	result["full_decode_p50_ms"] = percentile(full_latencies, 0.5) * 1000
+	result["speedup"] = percentile(full_latencies, 0.5) / percentile(latencies, 0.5) if latencies else 0.0
+	return result
+
+def bench_import(app, image_files, width, height):
+	## the full ImageList.load_images path: worker pool, ordered rows,
+	## preview frames going into the store
+	frame_store = FrameStore(lambda image_path: QPixmap.fromImage(compose_frame(image_path, width, height)),
+						1 << 40)
+	image_list = ImageList(None, frame_store)
+	image_list.loader.set_frame_size(width, height)
+	arrivals = []
+	image_list.loader.image_loaded.connect(lambda image_path, image: arrivals.append(time.perf_counter()))
+
+	with RssSampler() as rss:
+		start_time = time.perf_counter()
+		image_list.load_images(os.path.dirname(image_files[0]), image_files)
+
+		while image_list.loader.is_loading():
+			app.processEvents()
+
+		elapsed = time.perf_counter() - start_time
+
+	## per-frame latency here is the gap between rows arriving in the list
+	latencies = [later - earlier for earlier, later in zip([start_time] + arrivals, arrivals)]
+	result = summarize(latencies, elapsed, rss.peak)
+	result["first_frame_ms"] = (arrivals[0] - start_time) * 1000 if arrivals else 0.0
+	image_list.deleteLater()
+	return result
+
+def bench_preview(app, image_files):
+	## shown and repainted each frame so the blit is timed, not just setPixmap
+	display = ImageDisplay()
+	display.show()
+	app.processEvents()
+	pixmaps = [QPixmap.fromImage(compose_frame(image_path, display.width(), display.height()))
+			for image_path in image_files]
+	latencies = []
+
+	with RssSampler() as rss:
+		start_time = time.perf_counter()
+
+		for pixmap in pixmaps:
+			frame_start = time.perf_counter()
+			display.switch_image(pixmap)
+			display.repaint()
+			latencies.append(time.perf_counter() - frame_start)
+
+		elapsed = time.perf_counter() - start_time
+
+	display.deleteLater()
+	return summarize(latencies, elapsed, rss.peak)
+
+def bench_bridge(image_files, width, height):
+	## composed frame to encoder input, the way write_video hands frames to
+	## ffmpeg, with the null device standing in for its stdin
+	frame_images = [compose_frame(image_path, width, height) for image_path in image_files]
+	latencies = []
+
+	with RssSampler() as rss, open(os.devnull, "wb") as sink:
+		start_time = time.perf_counter()
+
+		for frame_image in frame_images:
+			frame_start = time.perf_counter()
+			encoder_image = rgba_image(frame_image)
+			sink.write(frame_array(encoder_image).data)
+			latencies.append(time.perf_counter() - frame_start)
+
+		elapsed = time.perf_counter() - start_time
+
+	return summarize(latencies, elapsed, rss.peak)
+
+def bench_export(image_files, width, height, fps = 24, framehold = 1):
+	stamps = []
+
+	def progress(frames_written, total_frames):
+		stamps.append(time.perf_counter())
+		return True
+
+	with tempfile.TemporaryDirectory() as temp_dir:
+		output_filename = os.path.join(temp_dir, "benchmark.mp4")
+
+		with RssSampler() as rss:
+			start_time = time.perf_counter()
+			write_video(image_files, output_filename, width, height, fps, framehold, progress)
+			elapsed = time.perf_counter() - start_time
+
+	latencies = [later - earlier for earlier, later in zip([start_time] + stamps, stamps)]
+	return summarize(latencies, elapsed, rss.peak)
+
+def bench_startup(runs):
+	## time to first window, from interpreter start to the window being shown
+	latencies = []
+	heavy_imports = []
+
+	for _ in range(runs):
+		completed = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd = BASE_PATH,
+								capture_output = True, text = True, check = True)
+		result = json.loads(completed.stdout)
+		latencies.append(result["seconds"])
+		heavy_imports = result["heavy_imports"]
+
+	return {
+		"runs": runs,
+		"startup_ms": {
+			"p50": percentile(latencies, 0.5) * 1000,
+			"p90": percentile(latencies, 0.9) * 1000,
+			"max": max(latencies) * 1000
+		},
+		"heavy_imports": heavy_imports
+	}
+
+def compare(results, baseline, tolerance):
+	## a stage regresses when its throughput falls (or, for start-up, its
+	## time rises) more than tolerance past the baseline
+	regressions = []
+
+	for name, result in results.items():
+		previous = baseline.get("results", {}).get(name)
+
+		if not previous:
+			continue
+
+		if "startup_ms" in result:
+			before, after = previous["startup_ms"]["p50"], result["startup_ms"]["p50"]
+
+			if after > before * (1 + tolerance):
+				regressions.append((name, f"{before:.0f} ms", f"{after:.0f} ms"))
+		elif previous["fps"] and result["fps"] < previous["fps"] * (1 - tolerance):
+			regressions.append((name, f"{previous['fps']:.1f} fps", f"{result['fps']:.1f} fps"))
+
+	return regressions
+
+def parse_args(argv):
+	parser = argparse.ArgumentParser(description = "Benchmark Animator's Pal's import, compose, preview and export paths.")
+	parser.add_argument("--stages", nargs = "+", default = ["startup", "compose", "decode", "import", "preview", "bridge", "export"],
+					choices = ["startup", "compose", "decode", "import", "preview", "bridge", "export"])
+	parser.add_argument("--resolutions", nargs = "+", default = ["720p", "1080p", "4K", "8K"], choices = list(RESOLUTIONS))
+	parser.add_argument("--frames", type = int, default = 24, help = "frames per synthetic sequence")
+	parser.add_argument("--no-bundled", action = "store_true", help = "skip the bundled sequence/ TIFFs")
+	parser.add_argument("--startup-runs", type = int, default = 5)
+	parser.add_argument("--startup-target-ms", type = float, default = 1000.0,
+					help = "fail when median time to first window is over this (default 1000)")
+	parser.add_argument("--output", help = "write results as JSON to this file")
+	parser.add_argument("--baseline", help = "compare against results saved by an earlier --output run")
+	parser.add_argument("--tolerance", type = float, default = 0.10, help = "allowed fps drop before a stage fails (default 0.10)")
+	return parser.parse_args(argv)
+
+def main(argv = None):
+	args = parse_args(sys.argv[1:] if argv is None else argv)
+	app = QApplication.instance() or QApplication([])
+	results = {}
+	over_target = False
+
+	if "startup" in args.stages:
+		result = bench_startup(args.startup_runs)
+		results["startup"] = result
+		over_target = result["startup_ms"]["p50"] > args.startup_target_ms
+		print(f"{'startup':40} p50 {result['startup_ms']['p50']:8.1f} ms  p90 {result['startup_ms']['p90']:8.1f} ms"
+			f"  target {args.startup_target_ms:.0f} ms  heavy imports: {', '.join(result['heavy_imports']) or 'none'}")
+
+	with tempfile.TemporaryDirectory() as temp_dir:
+		sequences = {}
+
+		if not args.no_bundled:
+			sequences["bundled"] = bundled_sequence()
+
+		for resolution in args.resolutions:
+			width, height = RESOLUTIONS[resolution]
+			sequences[f"synthetic{resolution}"] = make_synthetic_sequence(
+				os.path.join(temp_dir, resolution), width, height, args.frames)
+
+		if "decode" in args.stages:
+			sequences["scans"] = make_synthetic_sequence(os.path.join(temp_dir, "scans"), *SCAN_SIZE, args.frames, "jpg")
+
+		for sequence_name, image_files in sequences.items():
+			## the preview blit is at the display's size whatever the export
+			## resolution, so it's only run once for each sequence
+			previewed = False
+
+			for resolution in args.resolutions:
+				width, height = RESOLUTIONS[resolution]
+				
+				## synthetic sources are only run at their own resolution
+				if sequence_name.startswith("synthetic") and sequence_name != f"synthetic{resolution}":
+					continue
+
+				for stage in args.stages:
+					## the scans are only decoded, and only they are
+					if stage == "startup" or (stage == "decode") != (sequence_name == "scans"):
+						continue
+
+					if stage == "preview" and previewed:
+						continue
+
+					name = f"{stage}/{sequence_name}@{resolution}"
+
+					if stage == "compose":
+						result = bench_compose(image_files, width, height)
+					elif stage == "decode":
+						result = bench_decode(image_files, width, height)
+					elif stage == "import":
+						result = bench_import(app, image_files, width, height)
+					elif stage == "preview":
+						result = bench_preview(app, image_files)
+						name = f"{stage}/{sequence_name}@display"
+						previewed = True
+					elif stage == "bridge":
+						result = bench_bridge(image_files, width, height)
+					else:
+						result = bench_export(image_files, width, height)
+
+					results[name] = result
+					print(f"{name:40} {result['fps']:9.1f} fps  p50 {result['latency_ms']['p50']:8.2f} ms"
+						f"  p99 {result['latency_ms']['p99']:8.2f} ms  rss {result['peak_rss_mb']:8.1f} MB"
+						+ (f"  full decode p50 {result['full_decode_p50_ms']:.2f} ms ({result['speedup']:.1f}x)"
+						if "speedup" in result else ""))
+
+	report = {
+		"meta": {
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"cpu_count": os.cpu_count(),
+			"frames": args.frames,
+			"time": time.strftime("%Y-%m-%dT%H:%M:%S")
+		},
+		"results": results
+	}
+
+	if args.output:
+		with open(args.output, "w") as output:
+			json.dump(report, output, indent = 2)
+
+	if args.baseline:
+		with open(args.baseline) as baseline_file:
+			regressions = compare(results, json.load(baseline_file), args.tolerance)
+
+		for name, before, after in regressions:
+			print(f"REGRESSION {name}: {before} -> {after}", file = sys.stderr)
+
+		if regressions:
+			return 1
+
+	if over_target:
+		print(f"Start-up is over the {args.startup_target_ms:.0f} ms target.", file = sys.stderr)
+		return 1
+
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
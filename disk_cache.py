@@ -0,0 +1,241 @@
+## Python standard
+import os
+import struct
+import hashlib
+import threading
+
+## PySide6
+from PySide6.QtCore import QStandardPaths
+from PySide6.QtGui import QImage
+
+## magic, width, height, bytes per line, QImage format
+HEADER = struct.Struct("<4siiii")
+MAGIC = b"APF2"
+
+## magic, source mtime (ns), source size, content key (hex)
+LINK_HEADER = struct.Struct("<4sqq32s")
+LINK_MAGIC = b"APL1"
+
+## frames bigger than this share of the cache aren't stored; raw 8K frames
+## are about 132 MB each and would push everything else out in a few frames
+MAX_ENTRY_SHARE = 64
+
+def default_cache_dir():
+	base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+	return os.path.join(base, "AnimatorsPal", "frames")
+
+class DiskCache:
+	def __init__(self, cache_dir, max_bytes):
+		## composed frames are stored raw, so a hit is a single read with no
+		## decode. Frames are keyed by their content key and shared by every
+		## copy of a drawing; each file gets a small link, keyed by the file,
+		## naming the frame its content is stored under. Links carry the
+		## source's mtime and size, and one that no longer matches its file is
+		## thrown away the next time it's read
+		self.cache_dir = cache_dir
+		self.max_bytes = max_bytes
+		self.lock = threading.Lock()
+		self.total_bytes = None
+		self.hits = 0
+		self.misses = 0
+		os.makedirs(self.cache_dir, exist_ok = True)
+
+	def entry_path(self, key, width, height, extension = ".frame"):
+		key = f"{key}|{width}x{height}"
+		digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+		return os.path.join(self.cache_dir, digest[:2], digest + extension)
+
+	def load(self, image_path, width, height, file_key):
+		## returns (image, content key), or None on a miss; file_key names the
+		## file as it is now, the content key comes back so a hit can still be
+		## matched with its copies without a decode
+		link_path = self.entry_path(file_key, width, height, ".link")
+		content_key = self.read_link(image_path, link_path)
+
+		if content_key is None:
+			self.misses += 1
+			return None
+
+		entry_path = self.entry_path(content_key, width, height)
+
+		try:
+			with open(entry_path, "rb") as entry:
+				magic, entry_width, entry_height, bytes_per_line, image_format = HEADER.unpack(
+					entry.read(HEADER.size))
+				stale = magic != MAGIC or (entry_width, entry_height) != (width, height)
+				data = b"" if stale else entry.read()
+		except (OSError, struct.error):
+			## the frame was evicted; its link is no use without it
+			self.remove(link_path)
+			self.misses += 1
+			return None
+
+		if stale or len(data) != bytes_per_line * height:
+			self.remove(entry_path)
+			self.remove(link_path)
+			self.misses += 1
+			return None
+
+		self.touch(entry_path)
+		self.touch(link_path)
+
+		self.hits += 1
+		image = QImage(data, width, height, bytes_per_line, QImage.Format(image_format))
+		return image.copy(), content_key
+
+	def read_link(self, image_path, link_path):
+		try:
+			source = os.stat(image_path)
+
+			with open(link_path, "rb") as link:
+				magic, mtime_ns, size, content_key = LINK_HEADER.unpack(link.read(LINK_HEADER.size))
+		except (OSError, struct.error):
+			return None
+
+		if magic != LINK_MAGIC or (mtime_ns, size) != (source.st_mtime_ns, source.st_size):
+			self.remove(link_path)
+			return None
+
+		return content_key.rstrip(b"\0").decode("ascii")
+
+	def store(self, image_path, width, height, image, file_key, content_key):
+		entry_bytes = HEADER.size + image.sizeInBytes()
+
+		if entry_bytes > self.max_bytes // MAX_ENTRY_SHARE:
+			return
+
+		try:
+			source = os.stat(image_path)
+		except OSError:
+			return
+
+		## a copy of the drawing may have stored the frame already
+		entry_path = self.entry_path(content_key, width, height)
+
+		if os.path.exists(entry_path):
+			self.touch(entry_path)
+		else:
+			header = HEADER.pack(MAGIC, width, height, image.bytesPerLine(), image.format().value)
+
+			if not self.write_entry(entry_path, header, image.constBits()):
+				return
+
+		link = LINK_HEADER.pack(LINK_MAGIC, source.st_mtime_ns, source.st_size, content_key.encode("ascii"))
+		self.write_entry(self.entry_path(file_key, width, height, ".link"), link)
+
+	def write_entry(self, entry_path, *chunks):
+		temp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+
+		try:
+			os.makedirs(os.path.dirname(entry_path), exist_ok = True)
+
+			with open(temp_path, "wb") as entry:
+				for chunk in chunks:
+					entry.write(chunk)
+
+			entry_bytes = os.path.getsize(temp_path)
+		except OSError:
+			self.discard(temp_path)
+			return False
+
+		## readers never see a half-written entry; an entry another thread
+		## stored first is replaced, and only the difference is counted
+		with self.lock:
+			try:
+				replaced_bytes = os.path.getsize(entry_path)
+			except OSError:
+				replaced_bytes = 0
+
+			try:
+				os.replace(temp_path, entry_path)
+			except OSError:
+				self.discard(temp_path)
+				return False
+
+			self.count_bytes(entry_bytes - replaced_bytes)
+
+		return True
+
+	def touch(self, path):
+		## bump the mtime so eviction sees this entry as recently used
+		try:
+			os.utime(path)
+		except OSError:
+			pass
+
+	def discard(self, temp_path):
+		## a temporary file was never counted
+		try:
+			os.remove(temp_path)
+		except OSError:
+			pass
+
+	def remove(self, path):
+		try:
+			size = os.path.getsize(path)
+			os.remove(path)
+		except OSError:
+			return
+
+		self.add_bytes(-size)
+
+	def entries(self):
+		for folder in os.scandir(self.cache_dir):
+			if folder.is_dir():
+				for entry in os.scandir(folder.path):
+					if entry.name.endswith((".frame", ".link")):
+						yield entry
+
+	def add_bytes(self, delta):
+		with self.lock:
+			self.count_bytes(delta)
+
+	def count_bytes(self, delta):
+		## called with the lock held; the first count is taken from the disk,
+		## which already includes the change
+		if self.total_bytes is None:
+			self.total_bytes = sum(entry.stat().st_size for entry in self.entries())
+		else:
+			self.total_bytes += delta
+
+		if self.total_bytes > self.max_bytes:
+			self.evict()
+
+	def evict(self):
+		## least recently used first, down to 90% of the cap so we don't
+		## evict on every store once the cache is full
+		entries = sorted(self.entries(), key = lambda entry: entry.stat().st_mtime_ns)
+		target = self.max_bytes * 9 // 10
+
+		for entry in entries:
+			if self.total_bytes <= target:
+				break
+
+			try:
+				size = entry.stat().st_size
+				os.remove(entry.path)
+			except OSError:
+				continue
+
+			self.total_bytes -= size
+
+	def clear(self):
+		with self.lock:
+			for entry in list(self.entries()):
+				try:
+					os.remove(entry.path)
+				except OSError:
+					pass
+
+			self.total_bytes = 0
+
+	def stats(self):
+		requests = self.hits + self.misses
+
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"hit_rate": self.hits / requests if requests else 0.0,
+			"used_bytes": self.total_bytes,
+			"max_bytes": self.max_bytes
+		}
@@ -0,0 +1,145 @@
+## Python standard
+import os
+
+## PySide6
+from PySide6.QtCore import QObject, QFileSystemWatcher, QThreadPool, QTimer, Signal
+from PySide6.QtGui import QImage
+
+## local
+from image_loader import LoaderSignals, ComposeTask
+from frame_composer import FrameComposer, IMAGE_EXTENSIONS
+
+class FolderWatcher(QObject):
+	## a new or changed frame, composed at frame_size; changed is True when
+	## the file was already known and its contents have been replaced
+	image_ready = Signal(str, QImage, bool)
+
+	def __init__(self, parent = None):
+		super().__init__(parent)
+		## only the directory is watched, for files arriving or being
+		## replaced: a watch on every file would take a file descriptor each
+		## on macOS and the BSDs, which run out at 256 by default. A file
+		## overwritten in place doesn't touch the directory, so a slow poll
+		## looks over the files' stats as well
+		self.watcher = QFileSystemWatcher(self)
+		self.watcher.directoryChanged.connect(self.schedule_scan)
+
+		self.poll_timer = QTimer(self)
+		self.poll_timer.setInterval(2000)
+		self.poll_timer.timeout.connect(self.poll)
+
+		## a capture or scan arrives as a burst of change events; one scan
+		## runs once they've been quiet for a moment
+		self.scan_timer = QTimer(self)
+		self.scan_timer.setSingleShot(True)
+		self.scan_timer.setInterval(300)
+		self.scan_timer.timeout.connect(self.scan)
+
+		self.pool = QThreadPool(self)
+		self.signals = LoaderSignals()
+		self.signals.composed.connect(self.on_composed)
+		self.generation = 0
+		self.frame_size = (1280, 720)
+		self.composer = FrameComposer()
+		self.folder = None
+		self.known_files = {}
+		self.settling_files = {}
+		self.tasks = {}
+		self.next_task = 0
+
+	def set_frame_size(self, width, height):
+		self.frame_size = (width, height)
+
+	def is_watching(self):
+		return self.folder is not None
+
+	def watch(self, folder, known_files):
+		## files already in the list are only picked up again if they change
+		self.stop()
+		self.folder = os.path.normpath(folder)
+
+		for image_path in known_files:
+			try:
+				source = os.stat(image_path)
+			except OSError:
+				continue
+
+			self.known_files[os.path.normpath(image_path)] = (source.st_mtime_ns, source.st_size)
+
+		self.watcher.addPath(self.folder)
+		self.poll_timer.start()
+		self.scan()
+
+	def stop(self):
+		if self.watcher.directories():
+			self.watcher.removePaths(self.watcher.directories())
+
+		self.scan_timer.stop()
+		self.poll_timer.stop()
+		self.generation += 1
+		self.pool.clear()
+		self.folder = None
+		self.known_files.clear()
+		self.settling_files.clear()
+		self.tasks.clear()
+
+	def schedule_scan(self):
+		if self.folder is not None:
+			self.scan_timer.start()
+
+	def poll(self):
+		## a burst of changes already waiting on the timer is left to it
+		if not self.scan_timer.isActive():
+			self.scan()
+
+	def scan(self):
+		if self.folder is None:
+			return
+
+		settling = False
+
+		try:
+			with os.scandir(self.folder) as entries:
+				for entry in entries:
+					if not entry.name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+						continue
+
+					## every file is looked at again: the directory changing
+					## doesn't say which file did
+					image_path = os.path.normpath(entry.path)
+					source = entry.stat()
+					stamp = (source.st_mtime_ns, source.st_size)
+
+					if self.known_files.get(image_path) == stamp:
+						continue
+
+					## a file is only taken once it looks the same on two scans
+					## in a row, so a scan still being written isn't read half done
+					if self.settling_files.get(image_path) != stamp:
+						self.settling_files[image_path] = stamp
+						settling = True
+						continue
+
+					del self.settling_files[image_path]
+					changed = image_path in self.known_files
+					self.known_files[image_path] = stamp
+					self.compose(image_path, changed)
+		except OSError:
+			return
+
+		if settling:
+			self.scan_timer.start()
+
+	def compose(self, image_path, changed):
+		## only the new or changed frames are composed
+		task = self.next_task
+		self.next_task += 1
+		self.tasks[task] = (image_path, changed)
+		self.pool.start(ComposeTask(self, self.generation, task, image_path))
+
+	def on_composed(self, generation, task, image):
+		if generation != self.generation:
+			return
+
+		image_path, changed = self.tasks.pop(task)
+		self.image_ready.emit(image_path, image, changed)
@@ -0,0 +1,81 @@
+## PySide6
+from PySide6.QtGui import QImage
+
+## 32-bit formats whose bytes are laid out B, G, R, A (they're 0xAARRGGBB
+## words, and every platform Qt 6 ships on is little-endian), and those
+## laid out R, G, B, A
+WORD_FORMATS = (QImage.Format_RGB32, QImage.Format_ARGB32, QImage.Format_ARGB32_Premultiplied)
+BYTE_FORMATS = (QImage.Format_RGBX8888, QImage.Format_RGBA8888, QImage.Format_RGBA8888_Premultiplied)
+
+## numpy is imported on first use rather than at start-up, as in video_exporter
+def frame_array(image, writable = False):
+	## a (height, width, 4) NumPy view of a 32-bit QImage's pixels, without
+	## copying them; the view doesn't keep the image alive, so hold on to
+	## the image for as long as the view is used
+	import numpy as np
+
+	if image.format() not in WORD_FORMATS + BYTE_FORMATS:
+		raise ValueError(f"Not a 32-bit RGB image format: {image.format()}")
+
+	## bits() detaches the image from any copies sharing it, so writing
+	## through the view only changes this image
+	bits = image.bits() if writable else image.constBits()
+	buffer = np.frombuffer(bits, np.uint8, image.sizeInBytes())
+	width, height = image.width(), image.height()
+
+	## rows are bytesPerLine apart; slicing off any padding keeps this a view
+	return buffer.reshape(height, image.bytesPerLine())[:, :width * 4].reshape(height, width, 4)
+
+def channel_order(image):
+	if image.format() in BYTE_FORMATS:
+		return "rgba"
+	return "bgra"
+
+def rgba_image(image):
+	## encoders take RGBA byte order; an RGB32 frame is swizzled by Qt's own
+	## converter, which beats any strided NumPy copy, and anything already
+	## in byte order is passed through
+	if channel_order(image) == "rgba":
+		return image
+	return image.convertToFormat(QImage.Format_RGBX8888)
+
+def black_frame(width, height):
+	frame_image = QImage(width, height, QImage.Format_RGB32)
+	frame_image.fill(0xff000000)
+	return frame_image
+
+def letterbox(image, width, height):
+	## centre image in a black width x height RGB32 frame; only the bars are
+	## filled and the picture goes in with one slice assignment
+	if image.isNull():
+		## a file that wouldn't decode comes out as a black frame
+		return black_frame(width, height)
+
+	if image.hasAlphaChannel():
+		## premultiplied colour is the picture over black, which is what a
+		## painter would have drawn
+		image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+	elif image.format() != QImage.Format_RGB32:
+		image = image.convertToFormat(QImage.Format_RGB32)
+
+	if image.width() == width and image.height() == height and not image.hasAlphaChannel():
+		return image
+
+	frame_image = QImage(width, height, QImage.Format_RGB32)
+	frame = frame_array(frame_image, writable = True)
+	x = (width - image.width()) // 2
+	y = (height - image.height()) // 2
+	bottom, right = y + image.height(), x + image.width()
+
+	## RGB32 is 0xffRRGGBB, so black bars are (0, 0, 0, 255) in BGRA order
+	black = (0, 0, 0, 255)
+	frame[:y] = black
+	frame[bottom:] = black
+	frame[y:bottom, :x] = black
+	frame[y:bottom, right:] = black
+	frame[y:bottom, x:right] = frame_array(image)
+
+	if image.hasAlphaChannel():
+		frame[y:bottom, x:right, 3] = 255
+
+	return frame_image
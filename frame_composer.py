@@ -0,0 +1,290 @@
+## Python standard
+import os
+import hashlib
+import threading
+
+## PySide6
+from PySide6.QtCore import Qt, QSize
+from PySide6.QtGui import QImage, QImageReader
+
+## local
+from telemetry import telemetry
+from frame_buffer import letterbox, black_frame
+
+IMAGE_EXTENSIONS = (".jpg", ".png", ".bmp", ".tif")
+
+## reduced decodes keep at least this many times the frame size and are
+## smooth scaled the rest of the way, which keeps fine line work as clean as
+## a full decode would; JPEG's DCT scaling alone is visibly softer and aliased
+DECODE_OVERSAMPLE = 2
+
+## formats whose readers really do decode less data for a smaller size; PNG
+## and TIFF accept a scaled size too, but only scale after a full decode
+REDUCED_DECODE_FORMATS = (b"jpeg", b"jpg")
+
+## QImage is safe to use off the GUI thread, so
+## this is what the import workers call; QPixmaps are only made on the GUI side
+def decode_image(image_path, width = None, height = None):
+	## returns (image, source width, source height); given a frame size, a
+	## much bigger source in a format that can (JPEG, by DCT scaling) is
+	## decoded at a reduced size instead of in full
+	with telemetry.span("decode"):
+		return read_image(QImageReader(image_path), width, height)
+
+def read_image(reader, width, height):
+	source_size = reader.size()
+
+	if width is not None and source_size.isValid() and bytes(reader.format()) in REDUCED_DECODE_FORMATS:
+		wanted_size = source_size.scaled(width * DECODE_OVERSAMPLE, height * DECODE_OVERSAMPLE, Qt.KeepAspectRatio)
+
+		## libjpeg decodes at 1/2, 1/4 or 1/8 size; take the smallest that
+		## still has the detail wanted, at just that size so the reader
+		## doesn't scale it again
+		for denominator in (8, 4, 2):
+			reduced_size = QSize(source_size.width() // denominator, source_size.height() // denominator)
+
+			if reduced_size.width() >= wanted_size.width() and reduced_size.height() >= wanted_size.height():
+				reader.setScaledSize(reduced_size)
+				break
+
+	image = reader.read()
+
+	if image.isNull():
+		return image, 0, 0
+
+	if not source_size.isValid():
+		source_size = image.size()
+
+	## straight into the formats the scaler and letterbox work in, so
+	## nothing converts again further down the line
+	blit_format = QImage.Format_ARGB32_Premultiplied if image.hasAlphaChannel() else QImage.Format_RGB32
+
+	if image.format() != blit_format:
+		image.convertTo(blit_format)
+
+	return image, source_size.width(), source_size.height()
+
+def pixel_digest(image):
+	## fingerprint of the decoded pixels, so the same drawing saved twice
+	## (re-exported, re-encoded) is still recognised as one frame
+	digest = hashlib.blake2b(digest_size = 16)
+	digest.update(f"{image.width()}x{image.height()}:{image.format().value}".encode("ascii"))
+	bits = memoryview(image.constBits())
+	bytes_per_line = image.bytesPerLine()
+	line_bytes = (image.width() * image.depth() + 7) // 8
+
+	## line padding isn't part of the image and may hold anything
+	if line_bytes == bytes_per_line:
+		digest.update(bits[:image.sizeInBytes()])
+	else:
+		for y in range(image.height()):
+			digest.update(bits[y * bytes_per_line:y * bytes_per_line + line_bytes])
+
+	return digest.hexdigest()
+
+def compose_image(source_image, width, height):
+	## letterbox or pillarbox a decoded source into a black RGB32 frame
+	if source_image.isNull():
+		return black_frame(width, height)
+
+	with telemetry.span("scale"):
+		scaled_image = source_image.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+	return letterbox(scaled_image, width, height)
+
+def compose_frame(image_path, width, height, disk_cache = None):
+	return FrameComposer(disk_cache).compose(image_path, width, height)
+
+class FrameComposer:
+	def __init__(self, disk_cache = None, source_cache = None, frame_map = None):
+		## composed frames are per size and come from the disk cache when they
+		## can; decoded sources don't depend on the size, so with a source
+		## cache a new size (another export resolution, thumbnails, a cleared
+		## preview) is recomposed without reading the file again
+		self.disk_cache = disk_cache
+		self.source_cache = source_cache
+
+		## with a frame map, every composed frame is written once into a
+		## memory-mapped file and handed out as a view of the mapping
+		self.frame_map = frame_map
+
+		## frames are fingerprinted as they're composed: first by the file's
+		## path, size and modification time, then, the first time that file's
+		## content is decoded, by a hash of its pixels; copies of a drawing
+		## end up with one content key.
+		## A source decoded at a reduced size is only fingerprinted for the
+		## frame size it was decoded for, keyed (digest, width, height): two
+		## drawings that differ in a detail can come out the same reduced, but
+		## then their frames at that size are the same too
+		self.lock = threading.Lock()
+		self.content_keys = {}
+
+	def file_digest(self, image_path):
+		## a key for the file as it is now, or None if it can't be read; only
+		## the file's stat goes into it, since hashing its bytes would cost
+		## about as much as decoding them, and a file that's rewritten gets a
+		## new key
+		try:
+			source = os.stat(image_path)
+		except OSError:
+			return None
+
+		stamp = f"{os.path.abspath(image_path)}:{source.st_size}:{source.st_mtime_ns}"
+		return hashlib.blake2b(stamp.encode("utf-8", "surrogateescape"), digest_size = 16).hexdigest()
+
+	def content_key(self, image_path, width = None, height = None):
+		## the pixel fingerprint once the content has been decoded (in full,
+		## or for frames of width x height), the file fingerprint until then,
+		## None if the file can't be read
+		digest = self.file_digest(image_path)
+
+		if digest is None:
+			return None
+
+		return self.digest_key(digest, width, height)
+
+	def digest_key(self, digest, width = None, height = None):
+		with self.lock:
+			content_key = self.content_keys.get(digest)
+
+			if content_key is None and width is not None:
+				content_key = self.content_keys.get((digest, width, height))
+
+		return content_key if content_key is not None else digest
+
+	def source_image(self, image_path, width, height, digest = None, sizes = None):
+		## sizes are the frame sizes the image will be composed at, when
+		## there's more than the one it's decoded for
+		if self.source_cache is not None:
+			image, source_width, source_height = self.source_cache.get(image_path, width, height, decode_image)
+		else:
+			image, source_width, source_height = decode_image(image_path, width, height)
+
+		## a source cache hit is fingerprinted too, since its master may
+		## have been decoded for another size
+		if digest is not None and not image.isNull():
+			self.register_pixels(digest, image, image.width() == source_width, sizes or [(width, height)])
+
+		return image
+
+	def register_pixels(self, digest, image, full_size, sizes):
+		keys = [digest] if full_size else [(digest, width, height) for width, height in sizes]
+
+		with self.lock:
+			if digest in self.content_keys:
+				return
+
+			keys = [key for key in keys if key not in self.content_keys]
+
+		if keys:
+			content_key = pixel_digest(image)
+
+			with self.lock:
+				for key in keys:
+					self.content_keys[key] = content_key
+
+	def register_key(self, digest, width, height, content_key):
+		## a content key found with a cached frame, for frames of width x height
+		with self.lock:
+			if digest not in self.content_keys:
+				self.content_keys.setdefault((digest, width, height), content_key)
+
+	def compose(self, image_path, width, height):
+		with telemetry.span("compose", width = width, height = height):
+			digest = self.file_digest(image_path)
+			composed_image = self.cached_frame(image_path, width, height, digest)
+
+			if composed_image is None:
+				source_image = self.source_image(image_path, width, height, digest)
+				composed_image = self.store_frame(image_path, width, height, digest,
+												compose_image(source_image, width, height))
+
+			return composed_image
+
+	def compose_sizes(self, image_path, sizes):
+		## one file composed at several sizes from a single decode, made for
+		## the biggest of the sizes the caches don't already have
+		with telemetry.span("compose", sizes = len(sizes)):
+			digest = self.file_digest(image_path)
+			composed_images = {size: self.cached_frame(image_path, *size, digest) for size in sizes}
+			missing_sizes = [size for size, composed_image in composed_images.items() if composed_image is None]
+
+			if missing_sizes:
+				width = max(size[0] for size in missing_sizes)
+				height = max(size[1] for size in missing_sizes)
+				source_image = self.source_image(image_path, width, height, digest, missing_sizes)
+
+				for size in missing_sizes:
+					composed_images[size] = self.store_frame(image_path, *size, digest,
+															compose_image(source_image, *size))
+
+			return [composed_images[size] for size in sizes]
+
+	def cached_frame(self, image_path, width, height, digest):
+		## the frame map, then the disk cache, else None; the disk cache finds
+		## a frame by the file's stat, so a hit never needs the file read
+		if digest is None:
+			return None
+
+		if self.frame_map is not None:
+			mapped_image = self.frame_map.load(self.digest_key(digest, width, height), width, height)
+
+			if mapped_image is not None:
+				return mapped_image
+
+		if self.disk_cache is None:
+			return None
+
+		with telemetry.span("disk_cache_load"):
+			cached = self.disk_cache.load(image_path, width, height, digest)
+
+		if cached is None:
+			return None
+
+		## the frame's content key comes with it, so copies are still
+		## matched when nothing was decoded
+		cached_image, content_key = cached
+		self.register_key(digest, width, height, content_key)
+
+		if self.frame_map is not None:
+			cached_image = self.frame_map.store(self.digest_key(digest, width, height), width, height, cached_image)
+
+		return cached_image
+
+	def store_frame(self, image_path, width, height, digest, composed_image):
+		if digest is None:
+			return composed_image
+
+		if self.disk_cache is not None:
+			self.disk_cache.store(image_path, width, height, composed_image, digest,
+								self.digest_key(digest, width, height))
+
+		if self.frame_map is not None:
+			composed_image = self.frame_map.store(self.digest_key(digest, width, height), width, height, composed_image)
+
+		return composed_image
+
+class DraftComposer:
+	def __init__(self, composer, preview_size):
+		## draft renders shrink the preview-tier frames (usually a disk cache
+		## hit) instead of composing anything at the export resolution
+		self.composer = composer
+		self.preview_size = preview_size
+
+	def content_key(self, image_path, width = None, height = None):
+		## draft frames are made from the preview-size frames
+		return self.composer.content_key(image_path, *self.preview_size)
+
+	def compose(self, image_path, width, height):
+		preview_image = self.composer.compose(image_path, *self.preview_size)
+
+		if (width, height) == self.preview_size:
+			return preview_image
+
+		with telemetry.span("scale"):
+			draft_image = preview_image.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+		return letterbox(draft_image, width, height)
+
+	def compose_sizes(self, image_path, sizes):
+		return [self.compose(image_path, *size) for size in sizes]
@@ -0,0 +1,135 @@
+## Python standard
+import os
+from collections import OrderedDict
+
+## PySide6
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QThreadPool
+from PySide6.QtGui import QPixmap
+
+## local
+from image_loader import LoaderSignals, ComposeTask
+from frame_composer import FrameComposer
+
+THUMBNAIL_SIZE = (96, 54)
+
+class FrameListModel(QAbstractTableModel):
+	def __init__(self, frame_store, parent = None):
+		super().__init__(parent)
+		## rows are read straight from the frame store's file list when the
+		## view asks for them; nothing is kept per row
+		self.frame_store = frame_store
+		self.rows = 0
+		self.headers = ["File Name", "Folder"]
+
+		## thumbnails are only made for rows the view actually draws
+		self.show_thumbnails = False
+		self.thumbnails = OrderedDict()
+		self.max_thumbnails = 2000
+		self.pool = QThreadPool(self)
+		self.signals = LoaderSignals()
+		self.signals.composed.connect(self.on_thumbnail_composed)
+		self.generation = 0
+		self.frame_size = THUMBNAIL_SIZE
+		self.composer = FrameComposer()
+		self.in_flight = set()
+
+	def rowCount(self, parent = QModelIndex()):
+		return 0 if parent.isValid() else self.rows
+
+	def columnCount(self, parent = QModelIndex()):
+		return 0 if parent.isValid() else len(self.headers)
+
+	def headerData(self, section, orientation, role = Qt.DisplayRole):
+		if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+			return self.headers[section]
+		return None
+
+	def data(self, index, role = Qt.DisplayRole):
+		if not index.isValid() or index.row() >= self.rows:
+			return None
+
+		image_path = self.frame_store.image_files[index.row()]
+
+		if role == Qt.DisplayRole:
+			if index.column() == 0:
+				return os.path.basename(image_path)
+			return os.path.basename(os.path.dirname(image_path))
+		elif role == Qt.UserRole:
+			return image_path
+		elif role == Qt.DecorationRole and index.column() == 0 and self.show_thumbnails:
+			return self.thumbnail(index.row())
+
+		return None
+
+	def sync_rows(self):
+		## inserts every row the frame store has gained in one batch
+		new_rows = len(self.frame_store)
+
+		if new_rows <= self.rows:
+			return None
+
+		first_row = self.rows
+		self.beginInsertRows(QModelIndex(), first_row, new_rows - 1)
+		self.rows = new_rows
+		self.endInsertRows()
+		return first_row, new_rows - 1
+
+	def insert_file(self, row, image_path):
+		## a file that arrived after the import, at its sorted position
+		self.beginInsertRows(QModelIndex(), row, row)
+		self.frame_store.insert_file(row, image_path)
+		self.rows += 1
+
+		## thumbnails are kept by row, so the ones below move down with their rows
+		self.thumbnails = OrderedDict((thumbnail_row + 1 if thumbnail_row >= row else thumbnail_row, thumbnail)
+									for thumbnail_row, thumbnail in self.thumbnails.items())
+		self.generation += 1
+		self.in_flight.clear()
+		self.endInsertRows()
+
+	def refresh_row(self, row):
+		self.frame_store.refresh_file(row)
+		self.thumbnails.pop(row, None)
+		index = self.index(row, 0)
+		self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+	def reset(self):
+		self.beginResetModel()
+		self.rows = 0
+		self.generation += 1
+		self.pool.clear()
+		self.in_flight.clear()
+		self.thumbnails.clear()
+		self.endResetModel()
+
+	def set_show_thumbnails(self, show_thumbnails):
+		self.show_thumbnails = show_thumbnails
+		
+		if self.rows:
+			self.dataChanged.emit(self.index(0, 0), self.index(self.rows - 1, 0), [Qt.DecorationRole])
+
+	def thumbnail(self, row):
+		thumbnail = self.thumbnails.get(row)
+
+		if thumbnail is not None:
+			self.thumbnails.move_to_end(row)
+			return thumbnail
+
+		if row not in self.in_flight:
+			self.in_flight.add(row)
+			self.pool.start(ComposeTask(self, self.generation, row, self.frame_store.image_files[row]))
+
+		return None
+
+	def on_thumbnail_composed(self, generation, row, image):
+		if generation != self.generation:
+			return
+
+		self.in_flight.discard(row)
+		self.thumbnails[row] = QPixmap.fromImage(image)
+
+		while len(self.thumbnails) > self.max_thumbnails:
+			self.thumbnails.popitem(last = False)
+
+		index = self.index(row, 0)
+		self.dataChanged.emit(index, index, [Qt.DecorationRole])
@@ -0,0 +1,136 @@
+## Python standard
+import os
+import mmap
+import tempfile
+import threading
+
+## PySide6
+from PySide6.QtCore import QStandardPaths
+from PySide6.QtGui import QImage
+
+## the file grows a chunk of about this size at a time, and a chunk, once
+## mapped, stays mapped for the life of the store
+CHUNK_BYTES = 256 * 1024 * 1024
+
+def default_map_dir():
+	## on disk next to the frame cache; the system temp dir may be in RAM
+	base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+	return os.path.join(base, "AnimatorsPal", "maps")
+
+class MappedFrameFile:
+	def __init__(self, directory, width, height):
+		## one file of fixed-stride RGB32 records for one frame size, plus an
+		## index from content key to record offset
+		self.width = width
+		self.height = height
+		self.record_bytes = width * height * 4
+
+		## chunk offsets have to fall on the mapping granularity
+		granularity = mmap.ALLOCATIONGRANULARITY
+		self.chunk_frames = max(1, CHUNK_BYTES // self.record_bytes)
+		self.chunk_bytes = -(-self.chunk_frames * self.record_bytes // granularity) * granularity
+
+		self.file = tempfile.TemporaryFile(prefix = f"frames-{width}x{height}-", dir = directory)
+		self.chunks = []
+		self.offsets = {}
+
+	def used_bytes(self):
+		## the file is sparse past the last record written
+		return len(self.offsets) * self.record_bytes
+
+	def image(self, offset):
+		## a QImage over the mapped record itself; it holds the mapping open
+		## for as long as it lives
+		chunk = self.chunks[offset // self.chunk_bytes]
+		start = offset % self.chunk_bytes
+		record = memoryview(chunk)[start:start + self.record_bytes]
+		return QImage(record, self.width, self.height, self.width * 4, QImage.Format_RGB32)
+
+	def load(self, key):
+		offset = self.offsets.get(key)
+		return self.image(offset) if offset is not None else None
+
+	def store(self, key, image):
+		if len(self.offsets) == len(self.chunks) * self.chunk_frames:
+			chunk_offset = len(self.chunks) * self.chunk_bytes
+			self.file.truncate(chunk_offset + self.chunk_bytes)
+			self.chunks.append(mmap.mmap(self.file.fileno(), self.chunk_bytes, offset = chunk_offset))
+
+		chunk_index, slot = divmod(len(self.offsets), self.chunk_frames)
+		start = slot * self.record_bytes
+		self.chunks[chunk_index][start:start + self.record_bytes] = memoryview(image.constBits())[:self.record_bytes]
+
+		offset = chunk_index * self.chunk_bytes + start
+		self.offsets[key] = offset
+		return self.image(offset)
+
+class FrameMap:
+	def __init__(self, directory, max_bytes):
+		## composed frames written once into memory-mapped files, so long
+		## sequences at high resolutions are paged by the OS instead of being
+		## held on the Python heap or decoded and composed again; the files
+		## are temporary and go away with the store
+		self.directory = directory
+		self.max_bytes = max_bytes
+		self.lock = threading.Lock()
+		self.files = {}
+		self.hits = 0
+		self.misses = 0
+		os.makedirs(self.directory, exist_ok = True)
+
+	def used_bytes(self):
+		return sum(frame_file.used_bytes() for frame_file in self.files.values())
+
+	def load(self, key, width, height):
+		with self.lock:
+			frame_file = self.files.get((width, height))
+			image = frame_file.load(key) if frame_file is not None else None
+
+			if image is None:
+				self.misses += 1
+			else:
+				self.hits += 1
+
+			return image
+
+	def store(self, key, width, height, image):
+		## returns the mapped copy, or the image itself once the map is full
+		if image.format() != QImage.Format_RGB32 or (image.width(), image.height()) != (width, height):
+			return image
+
+		with self.lock:
+			frame_file = self.files.get((width, height))
+
+			if frame_file is None:
+				frame_file = self.files[(width, height)] = MappedFrameFile(self.directory, width, height)
+
+			if key in frame_file.offsets:
+				return frame_file.load(key)
+
+			if self.used_bytes() + frame_file.record_bytes > self.max_bytes:
+				return image
+
+			try:
+				return frame_file.store(key, image)
+			except OSError:
+				return image
+
+	def clear(self):
+		## a file goes away once the last image viewing into it is gone
+		with self.lock:
+			self.files = {}
+			self.hits = 0
+			self.misses = 0
+
+	def stats(self):
+		with self.lock:
+			requests = self.hits + self.misses
+
+			return {
+				"hits": self.hits,
+				"misses": self.misses,
+				"hit_rate": self.hits / requests if requests else 0.0,
+				"mapped_frames": sum(len(frame_file.offsets) for frame_file in self.files.values()),
+				"used_bytes": self.used_bytes(),
+				"max_bytes": self.max_bytes
+			}
@@ -0,0 +1,158 @@
+from collections import OrderedDict, Counter
+
+class FrameStore:
+	def __init__(self, compose, budget_bytes, content_key = None):
+		## compose(image_path) builds a frame on demand; only the file list
+		## is kept for every frame, composed frames live in a bounded LRU
+		self.compose = compose
+		self.budget_bytes = budget_bytes
+		self.image_files = []
+		self.frames = OrderedDict()
+
+		## content_key(image_path) fingerprints a frame's content; frames with
+		## the same key (a drawing copied for a hold) share one composed frame
+		self.content_key = content_key
+		self.frame_keys = []
+		self.key_counts = Counter()
+		self.duplicate_frames = 0
+		self.used_bytes = 0
+		self.hits = 0
+		self.misses = 0
+
+	def __len__(self):
+		return len(self.image_files)
+
+	def add_files(self, image_files):
+		self.image_files.extend(image_files)
+
+		for image_path in image_files:
+			key = self.file_key(image_path)
+			self.frame_keys.append(key)
+			self.count_key(key)
+
+	def insert_file(self, index, image_path):
+		## frames are keyed by content or path, never by position, so the
+		## frames after an insert keep their composed frames
+		key = self.file_key(image_path)
+		self.image_files.insert(index, image_path)
+		self.frame_keys.insert(index, key)
+		self.count_key(key)
+
+	def refresh_file(self, index):
+		## a file was overwritten: rekey it, and drop its old frame unless a
+		## copy elsewhere in the list still shows that content
+		old_key = self.frame_keys[index]
+		old_frame_key = self.frame_key(index)
+		key = self.file_key(self.image_files[index])
+		self.frame_keys[index] = key
+		self.uncount_key(old_key)
+		self.count_key(key)
+
+		if (old_key is None or not self.key_counts[old_key]) and old_frame_key in self.frames:
+			self.used_bytes -= self.frame_bytes(self.frames.pop(old_frame_key))
+
+	def file_key(self, image_path):
+		return self.content_key(image_path) if self.content_key is not None else None
+
+	def count_key(self, key):
+		if key is None:
+			return
+
+		if self.key_counts[key]:
+			self.duplicate_frames += 1
+
+		self.key_counts[key] += 1
+
+	def uncount_key(self, key):
+		if key is None:
+			return
+
+		self.key_counts[key] -= 1
+
+		if self.key_counts[key]:
+			self.duplicate_frames -= 1
+		else:
+			del self.key_counts[key]
+
+	def frame_key(self, index):
+		key = self.frame_keys[index]
+		return key if key is not None else self.image_files[index]
+
+	def has_frame(self, index):
+		return self.frame_key(index) in self.frames
+
+	def touch(self, index):
+		## mark a frame as recently used without counting it as a request
+		key = self.frame_key(index)
+
+		if key in self.frames:
+			self.frames.move_to_end(key)
+
+	def get_frame(self, index):
+		key = self.frame_key(index)
+		frame = self.frames.get(key)
+
+		if frame is not None:
+			self.hits += 1
+			self.frames.move_to_end(key)
+			return frame
+
+		self.misses += 1
+		frame = self.compose(self.image_files[index])
+		self.put_frame(index, frame)
+		return frame
+
+	def put_frame(self, index, frame):
+		key = self.frame_key(index)
+
+		## a copy of a frame that's already here keeps the one buffer
+		if key in self.frames:
+			self.frames.move_to_end(key)
+			return
+
+		self.frames[key] = frame
+		self.used_bytes += self.frame_bytes(frame)
+		self.evict()
+
+	def frame_bytes(self, frame):
+		return frame.width() * frame.height() * frame.depth() // 8
+
+	def evict(self):
+		## always keep the most recent frame, even if it alone is over budget
+		while self.used_bytes > self.budget_bytes and len(self.frames) > 1:
+			_, frame = self.frames.popitem(last = False)
+			self.used_bytes -= self.frame_bytes(frame)
+
+	def set_budget(self, budget_bytes):
+		self.budget_bytes = budget_bytes
+		self.evict()
+
+	def invalidate(self):
+		## drop composed frames but keep the file list, e.g. on a resolution change
+		self.frames.clear()
+		self.used_bytes = 0
+
+	def clear(self):
+		self.invalidate()
+		self.image_files.clear()
+		self.frame_keys.clear()
+		self.key_counts.clear()
+		self.duplicate_frames = 0
+		self.reset_stats()
+
+	def reset_stats(self):
+		self.hits = 0
+		self.misses = 0
+
+	def stats(self):
+		requests = self.hits + self.misses
+
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"hit_rate": self.hits / requests if requests else 0.0,
+			"cached_frames": len(self.frames),
+			"duplicate_frames": self.duplicate_frames,
+			"used_bytes": self.used_bytes,
+			"budget_bytes": self.budget_bytes
+		}
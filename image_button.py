@@ -3,12 +3,12 @@ from PySide6.QtCore import Qt
 from PySide6.QtGui import QIcon, QPixmap
 
 class ImageButton(QPushButton):
-	def __init__(self, up_image, down_image, parent = None):
+	def __init__(self, up_image, down_image, resource_manager, parent = None):
 		super().__init__(parent)
-		self.up_icon = QIcon(up_image)
-		self.down_icon = QIcon(down_image)
+		self.up_icon = resource_manager.get_icon(up_image)
+		self.down_icon = resource_manager.get_icon(down_image)
 		self.setIcon(self.up_icon)
-		self.setIconSize(QPixmap(up_image).size())
+		self.setIconSize(resource_manager.get_pixmap(up_image).size())
 		self.setFixedSize(64, 64)
 		self.setStyleSheet("QPushButton { border: none; }")
 
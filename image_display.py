@@ -2,6 +2,9 @@ from PySide6.QtWidgets import QLabel
 from PySide6.QtGui import QPixmap, QImage
 from PySide6.QtCore import Qt
 
+## local
+from telemetry import telemetry
+
 class ImageDisplay(QLabel):
 	def __init__(self):
 		super().__init__()
@@ -15,6 +18,10 @@ class ImageDisplay(QLabel):
 		self.setPixmap(self.black_background)
 
 	def switch_image(self, pixmap):
-		scaled_pixmap = pixmap.scaled(
-			self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-		self.setPixmap(scaled_pixmap)
+		with telemetry.span("display"):
+			## preview frames are already composed at the display size, so
+			## they are shown as-is; anything else is scaled to fit
+			if pixmap.size() != self.size():
+				pixmap = pixmap.scaled(
+					self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+			self.setPixmap(pixmap)
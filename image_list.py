@@ -1,56 +1,184 @@
-from PySide6.QtWidgets import QTreeWidget, QTreeWidgetItem, QProgressDialog, QFileDialog, QHeaderView
-from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QTableView, QAbstractItemView, QProgressDialog, QFileDialog, QHeaderView
+from PySide6.QtCore import Qt, Signal, QTimer, QSize
+from PySide6.QtGui import QPixmap
 import os
+import bisect
 
-class ImageList(QTreeWidget):
-	def __init__(self, parent=None):
+## local
+from image_loader import ImageLoader
+from frame_composer import IMAGE_EXTENSIONS
+from sequence_scan import natural_key
+from frame_list_model import FrameListModel, THUMBNAIL_SIZE
+
+class ImageList(QTableView):
+	images_added = Signal(int, int)
+	image_inserted = Signal(int)
+	image_updated = Signal(int)
+
+	def __init__(self, parent, frame_store):
 		super().__init__(parent)
 		self.parent = parent
-		self.image_files = []
-		self.images = []
-		self.itemClicked.connect(self.on_item_clicked)
-		
-		# Set up the tree widget with two columns
-		self.setColumnCount(2)
-		self.setHeaderLabels(["File Name", "Folder"])
+		self.frame_store = frame_store
+		self.progress = None
+		self.clicked.connect(self.on_item_clicked)
+
+		## a model over the frame store rather than an item per frame, so
+		## long timelines cost nothing until rows are scrolled into view;
+		## a table view rather than a tree view because QTreeView lays out
+		## every row again on each insert, which is quadratic over an import
+		self.frame_model = FrameListModel(frame_store, self)
+		self.setModel(self.frame_model)
+		self.setShowGrid(False)
+		self.setWordWrap(False)
+		self.setSelectionBehavior(QAbstractItemView.SelectRows)
+		self.setSelectionMode(QAbstractItemView.SingleSelection)
+		self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+		self.verticalHeader().hide()
+		self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+		self.row_height = self.verticalHeader().defaultSectionSize()
+
+		## rows that arrive together are inserted in one batch
+		self.insert_timer = QTimer(self)
+		self.insert_timer.setSingleShot(True)
+		self.insert_timer.setInterval(50)
+		self.insert_timer.timeout.connect(self.insert_rows)
+
+		## decoding and composing run on a worker pool; rows are added
+		## as their frames come back
+		self.loader = ImageLoader(self)
+		self.loader.image_loaded.connect(self.add_image)
+		self.loader.progress.connect(self.update_progress)
+		self.loader.finished.connect(self.close_progress)
+		self.loader.cancelled.connect(self.close_progress)
 		
 		# Adjust column widths
-		header = self.header()
+		header = self.horizontalHeader()
+		header.setHighlightSections(False)
 		header.setSectionResizeMode(0, QHeaderView.Stretch)
 		header.setSectionResizeMode(1, QHeaderView.ResizeToContents)
 
-	def load_images(self, folder, files, overlay_image_on_background):
-		all_files = os.listdir(folder)
-		new_image_files = [os.path.join(folder, file) for file in files if file.lower().endswith((".jpg", ".png", ".bmp", ".tif"))]
-		new_image_files.sort()
-
-		progress = QProgressDialog("Loading images...", "Cancel", 0, len(new_image_files), self)
-		progress.setWindowModality(Qt.WindowModal)
-		progress.setWindowTitle("Loading Images")
-
-		for i, img_file in enumerate(new_image_files):
-			if progress.wasCanceled():
-					break
-			
-			self.image_files.append(img_file)
-			processed_img = overlay_image_on_background(img_file)
-			self.images.append(processed_img)
-			
-			# Create a QTreeWidgetItem with two columns
-			item = QTreeWidgetItem(self)
-			item.setText(0, os.path.basename(img_file))
-			item.setText(1, os.path.basename(os.path.dirname(img_file)))
-			item.setData(0, Qt.UserRole, img_file)
-			
-			progress.setValue(i + 1)
-
-		progress.close()
-
-	def on_item_clicked(self, item, column):
-		current_row = self.indexOfTopLevelItem(item)
-		self.parent.switch_image(current_row)
+	def load_images(self, folder, files):
+		new_image_files = [os.path.join(folder, file) for file in files if file.lower().endswith(IMAGE_EXTENSIONS)]
+		new_image_files.sort(key = natural_key)
+
+		if not new_image_files:
+			return
+
+		self.show_progress(len(new_image_files))
+		self.loader.load(new_image_files)
+
+	def load_folder(self, folder, pattern = None, frame_range = None):
+		## the folder is scanned on a worker thread and frames start composing
+		## as files are found; rows go in once the scan has put them in order
+		self.show_progress(0)
+		self.loader.scan(folder, pattern, frame_range)
+
+	def show_progress(self, total):
+		if self.progress is None:
+			## not modal, so frames can be viewed while the rest load
+			self.progress = QProgressDialog("Loading images...", "Cancel", 0, total, self)
+			self.progress.setWindowTitle("Loading Images")
+			self.progress.canceled.connect(self.loader.cancel)
+			self.progress.show()
+
+	def add_image(self, img_file, image):
+		self.frame_store.add_files([img_file])
+		row = len(self.frame_store) - 1
+
+		## a copy of a frame already in the store shares its pixmap
+		if not image.isNull() and not self.frame_store.has_frame(row):
+			self.frame_store.put_frame(row, QPixmap.fromImage(image))
+
+		if not self.insert_timer.isActive():
+			self.insert_timer.start()
+
+	def insert_image(self, img_file, image):
+		## a watched-folder arrival goes in at its sorted position among the
+		## last run of rows from its folder, after any rows still waiting on
+		## the batch timer; the list as a whole may hold several folders
+		self.insert_timer.stop()
+		self.insert_rows()
+
+		image_files = self.frame_store.image_files
+		folder = os.path.dirname(img_file)
+		last_row = len(image_files) - 1
+
+		while last_row >= 0 and os.path.dirname(os.path.normpath(image_files[last_row])) != folder:
+			last_row -= 1
+
+		if last_row < 0:
+			row = len(image_files)
+		else:
+			first_row = last_row
+
+			while first_row > 0 and os.path.dirname(os.path.normpath(image_files[first_row - 1])) == folder:
+				first_row -= 1
+
+			row = bisect.bisect(image_files, natural_key(img_file), first_row, last_row + 1, key = natural_key)
+		self.frame_model.insert_file(row, img_file)
+
+		if not image.isNull() and not self.frame_store.has_frame(row):
+			self.frame_store.put_frame(row, QPixmap.fromImage(image))
+
+		self.image_inserted.emit(row)
+
+	def update_image(self, img_file, image):
+		## a file in the list was overwritten; rows showing it are recomposed
+		for row, image_path in enumerate(self.frame_store.image_files):
+			if os.path.normpath(image_path) != img_file:
+				continue
+
+			self.frame_model.refresh_row(row)
+
+			if not image.isNull() and not self.frame_store.has_frame(row):
+				self.frame_store.put_frame(row, QPixmap.fromImage(image))
+
+			self.image_updated.emit(row)
+
+	def insert_rows(self):
+		added = self.frame_model.sync_rows()
+
+		if added is not None:
+			self.images_added.emit(*added)
+
+	def row_count(self):
+		return self.frame_model.rowCount()
+
+	def select_row(self, row):
+		self.setCurrentIndex(self.frame_model.index(row, 0))
+
+	def set_show_thumbnails(self, show_thumbnails):
+		self.frame_model.set_show_thumbnails(show_thumbnails)
+		
+		if show_thumbnails:
+			self.setIconSize(QSize(*THUMBNAIL_SIZE))
+			self.verticalHeader().setDefaultSectionSize(THUMBNAIL_SIZE[1] + 4)
+		else:
+			self.verticalHeader().setDefaultSectionSize(self.row_height)
+
+	def update_progress(self, done, total):
+		if self.progress is not None:
+			self.progress.setMaximum(total)
+			self.progress.setValue(done)
+
+	def close_progress(self):
+		## closing the dialog emits canceled(), so let go of it first
+		progress, self.progress = self.progress, None
+
+		if progress is not None:
+			progress.canceled.disconnect(self.loader.cancel)
+			progress.close()
+			progress.deleteLater()
+
+		## don't leave the last few rows waiting on the batch timer
+		self.insert_timer.stop()
+		self.insert_rows()
+
+	def on_item_clicked(self, index):
+		self.parent.switch_image(index.row())
 
 	def clear_images(self):
-		self.clear()
-		self.image_files.clear()
-		self.images.clear()
+		self.loader.cancel()
+		self.insert_timer.stop()
+		self.frame_store.clear()
+		self.frame_model.reset()
@@ -0,0 +1,231 @@
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QSize, Signal
+from PySide6.QtGui import QImage
+
+## local
+from frame_composer import FrameComposer
+from frame_buffer import black_frame
+from sequence_scan import scan_folder
+
+class LoaderSignals(QObject):
+	composed = Signal(int, int, QImage)
+	found = Signal(int, list)
+	scanned = Signal(int, list)
+	scan_failed = Signal(int, str)
+
+class ComposeTask(QRunnable):
+	def __init__(self, loader, generation, index, image_path):
+		super().__init__()
+		self.loader = loader
+		self.generation = generation
+		self.index = index
+		self.image_path = image_path
+
+	def run(self):
+		## skip work that was cancelled while it sat in the queue
+		if self.generation != self.loader.generation:
+			return
+
+		width, height = self.loader.frame_size
+
+		## a frame that fails to compose still arrives, as a black frame, so
+		## the loader never waits on it
+		try:
+			image = self.loader.composer.compose(self.image_path, width, height)
+		except Exception:
+			image = black_frame(width, height)
+
+		if self.generation == self.loader.generation:
+			self.loader.signals.composed.emit(self.generation, self.index, image)
+
+class ScannedComposeTask(ComposeTask):
+	def run(self):
+		## once the scan is done the rest are queued again in sorted order
+		if self.loader.scanning:
+			super().run()
+
+class ScanTask(QRunnable):
+	def __init__(self, loader, generation, folder, pattern, frame_range):
+		super().__init__()
+		self.loader = loader
+		self.generation = generation
+		self.folder = folder
+		self.pattern = pattern
+		self.frame_range = frame_range
+
+	def run(self):
+		found = []
+
+		try:
+			for batch in scan_folder(self.folder, self.pattern, self.frame_range):
+				if self.generation != self.loader.generation:
+					return
+
+				self.loader.signals.found.emit(self.generation, [image_path for _, image_path in batch])
+				found.extend(batch)
+		except OSError as e:
+			## whatever was found before the folder failed still goes in
+			self.loader.signals.scan_failed.emit(self.generation, str(e))
+
+		## the sort keys were worked out once per file during the scan
+		found.sort()
+		self.loader.signals.scanned.emit(self.generation, [image_path for _, image_path in found])
+
+class ImageLoader(QObject):
+	## emitted on the GUI thread, in sorted order, as each frame is ready
+	image_loaded = Signal(str, QImage)
+	progress = Signal(int, int)
+	## an import began with nothing else loading
+	started = Signal()
+	finished = Signal()
+	## an import stopped part way; finished is only for one that completed
+	cancelled = Signal()
+	## a folder being imported couldn't be read, or not all of it
+	scan_failed = Signal(str)
+
+	def __init__(self, parent = None):
+		super().__init__(parent)
+		self.pool = QThreadPool(self)
+		self.signals = LoaderSignals()
+		self.signals.composed.connect(self.on_composed)
+		self.signals.found.connect(self.on_found)
+		self.signals.scanned.connect(self.on_scanned)
+		self.signals.scan_failed.connect(self.on_scan_failed)
+		self.generation = 0
+		self.frame_size = (1280, 720)
+		self.composer = FrameComposer()
+		self.image_files = []
+		self.pending = {}
+		self.next_index = 0
+
+		## a folder scan runs on its own thread so composing can start on
+		## what it has found so far
+		self.scan_pool = QThreadPool(self)
+		self.scan_pool.setMaxThreadCount(1)
+		self.scanning = False
+		self.scanned_count = 0
+		self.scanned_files = {}
+		self.scanned_images = {}
+		self.scanned_rows = {}
+
+	def set_frame_size(self, width, height):
+		self.frame_size = (width, height)
+
+	def is_loading(self):
+		return self.scanning or self.next_index < len(self.image_files)
+
+	def load(self, image_files):
+		if not self.is_loading():
+			self.started.emit()
+
+		first_index = len(self.image_files)
+		self.image_files.extend(image_files)
+
+		for index, image_path in enumerate(image_files, first_index):
+			self.pool.start(ComposeTask(self, self.generation, index, image_path))
+
+		self.progress.emit(self.next_index, len(self.image_files))
+
+	def scan(self, folder, pattern = None, frame_range = None):
+		if not self.is_loading():
+			self.started.emit()
+
+		self.scanning = True
+		self.scan_pool.start(ScanTask(self, self.generation, folder, pattern, frame_range))
+		self.progress.emit(self.next_index, 0)
+
+	def on_found(self, generation, image_files):
+		if generation != self.generation:
+			return
+
+		## composed in the order found, and tagged with a negative index
+		## until the scan is done and their rows are known
+		for image_path in image_files:
+			self.scanned_count += 1
+			self.scanned_files[self.scanned_count] = image_path
+			self.pool.start(ScannedComposeTask(self, generation, -self.scanned_count, image_path))
+
+	def on_scanned(self, generation, image_files):
+		if generation != self.generation:
+			return
+
+		## the found files that are already composed take their rows, the
+		## rest are queued again in sorted order, so rows can go in from the
+		## top without holding many composed frames back
+		self.scanning = False
+		first_index = len(self.image_files)
+		self.image_files.extend(image_files)
+
+		for index, image_path in enumerate(image_files, first_index):
+			image = self.scanned_images.pop(image_path, None)
+
+			if image is not None:
+				self.pending[index] = image
+			else:
+				self.scanned_rows[image_path] = index
+				self.pool.start(ComposeTask(self, generation, index, image_path))
+
+		self.scanned_images.clear()
+		self.release()
+
+	def on_scan_failed(self, generation, message):
+		if generation == self.generation:
+			self.scan_failed.emit(message)
+
+	def on_composed(self, generation, index, image):
+		if generation != self.generation:
+			return
+
+		if index < 0:
+			image_path = self.scanned_files.pop(-index, None)
+
+			## still scanning: keep it until its row is known
+			if self.scanning:
+				if image_path is not None:
+					self.scanned_images[image_path] = image
+				return
+
+			## finished after the scan did, so it may beat its requeued copy
+			index = self.scanned_rows.get(image_path)
+
+			if index is None:
+				return
+
+		## a file composed twice, once in scan order and once in row order
+		if index < self.next_index or index in self.pending:
+			return
+
+		self.pending[index] = image
+		self.release()
+
+	def release(self):
+		## hold back frames that finish early so rows are added in sorted order
+		while self.next_index in self.pending:
+			image = self.pending.pop(self.next_index)
+			
+			## the resolution changed while this frame was being composed
+			if image.size() != QSize(*self.frame_size):
+				image = QImage()
+
+			self.image_loaded.emit(self.image_files[self.next_index], image)
+			self.next_index += 1
+
+		self.progress.emit(self.next_index, len(self.image_files))
+
+		if not self.is_loading():
+			self.reset()
+			self.finished.emit()
+
+	def cancel(self):
+		self.generation += 1
+		self.pool.clear()
+		self.reset()
+		self.cancelled.emit()
+
+	def reset(self):
+		self.image_files = []
+		self.pending.clear()
+		self.next_index = 0
+		self.scanning = False
+		self.scanned_files.clear()
+		self.scanned_images.clear()
+		self.scanned_rows.clear()
@@ -0,0 +1,143 @@
+## Python standard
+import io
+import os
+import re
+import logging
+import threading
+import logging.handlers
+from collections import deque
+
+## ffmpeg's periodic status line, e.g.
+## frame=  120 fps= 38 q=28.0 size=     256kB time=00:00:04.96 bitrate= 422.7kbits/s speed=1.58x
+PROGRESS_PATTERN = re.compile(
+	r"frame=\s*(?P<frame>\d+)\s+fps=\s*(?P<fps>[\d.]+).*?"
+	r"time=\s*(?P<time>\S+)\s+bitrate=\s*(?P<bitrate>\S+)(?:.*?speed=\s*(?P<speed>\S+))?")
+
+def parse_progress(line):
+	match = PROGRESS_PATTERN.search(line)
+
+	if match is None:
+		return None
+
+	return {
+		"frame": int(match.group("frame")),
+		"fps": float(match.group("fps")),
+		"time": match.group("time"),
+		"bitrate": match.group("bitrate"),
+		"speed": match.group("speed")
+	}
+
+class LogCapture(io.TextIOBase):
+	def __init__(self, max_chars = 256 * 1024):
+		## stands in for stdout/stderr; keeps only the newest max_chars of
+		## output so long sessions with many exports don't keep growing
+		super().__init__()
+		self.max_chars = max_chars
+		self.lines = deque()
+		self.size = 0
+		self.partial = ""
+		self.listeners = []
+		self.file_logger = None
+		self.lock = threading.Lock()
+
+	def writable(self):
+		return True
+
+	def write(self, text):
+		if not text:
+			return 0
+
+		with self.lock:
+			## ffmpeg ends its status lines with \r rather than \n
+			chunks = re.split(r"[\r\n]", self.partial + text)
+			self.partial = chunks.pop()
+			lines = [line for line in chunks if line]
+
+			for line in lines:
+				self.lines.append(line)
+				self.size += len(line) + 1
+
+			while self.size > self.max_chars and len(self.lines) > 1:
+				self.size -= len(self.lines.popleft()) + 1
+
+		for line in lines:
+			if self.file_logger is not None:
+				self.file_logger.info(line)
+
+			event = parse_progress(line)
+
+			if event is not None:
+				for listener in list(self.listeners):
+					listener(event)
+
+		return len(text)
+
+	def flush(self):
+		pass
+
+	def getvalue(self):
+		with self.lock:
+			return "\n".join(self.lines)
+
+	def clear(self):
+		with self.lock:
+			self.lines.clear()
+			self.size = 0
+
+	def add_listener(self, listener):
+		self.listeners.append(listener)
+
+	def remove_listener(self, listener):
+		if listener in self.listeners:
+			self.listeners.remove(listener)
+
+	def set_log_file(self, log_path, max_bytes = 5 * 1024 * 1024, backup_count = 3):
+		## optionally spill everything to a rotating log file as well
+		if self.file_logger is not None:
+			for handler in list(self.file_logger.handlers):
+				self.file_logger.removeHandler(handler)
+				handler.close()
+			self.file_logger = None
+
+		if not log_path:
+			return
+
+		os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok = True)
+		handler = logging.handlers.RotatingFileHandler(log_path, maxBytes = max_bytes, backupCount = backup_count)
+		handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+		self.file_logger = logging.getLogger("animators_pal.capture")
+		self.file_logger.propagate = False
+		self.file_logger.setLevel(logging.INFO)
+		self.file_logger.addHandler(handler)
+
+class LogPipe:
+	## an OS pipe a child process can write its stderr to, drained into a
+	## LogCapture on a thread so the child never blocks on a full pipe
+	def __init__(self, log_capture):
+		self.log_capture = log_capture
+		read_fd, write_fd = os.pipe()
+		self.read_end = os.fdopen(read_fd, "rb")
+		self.write_end = os.fdopen(write_fd, "wb")
+		self.thread = threading.Thread(target = self.drain, daemon = True)
+		self.thread.start()
+
+	def drain(self):
+		while True:
+			data = self.read_end.read1(4096)
+			
+			if not data:
+				break
+			
+			self.log_capture.write(data.decode("utf-8", "replace"))
+
+		self.read_end.close()
+
+	def close_write_end(self):
+		## once the child has its own copy, drop ours so the reader sees EOF
+		## when the child exits
+		if not self.write_end.closed:
+			self.write_end.close()
+
+	def close(self):
+		self.close_write_end()
+		self.thread.join()
@@ -1,15 +1,23 @@
 ## python libraries
 import sys
+import multiprocessing
 
-## GUI library
-from PySide6.QtWidgets import QApplication
+if __name__ == "__main__":
+   ## needed for the batch renderer's process pool in a PyInstaller build
+   multiprocessing.freeze_support()
 
-## local
-from main_window import MainWindow
+   ## headless batch rendering: python main.py render <folders or globs> ...
+   if len(sys.argv) > 1 and sys.argv[1] == "render":
+      from batch_render import main as render_main
+      sys.exit(render_main(sys.argv[2:]))
+
+   ## GUI library
+   from PySide6.QtWidgets import QApplication
+
+   ## local
+   from main_window import MainWindow
 
-if __name__ == "__main__":
    app = QApplication(sys.argv)
    window = MainWindow()
    window.show()
    sys.exit(app.exec())
-   
\ No newline at end of file
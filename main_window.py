@@ -1,24 +1,25 @@
 ## Python standard
 import sys
 import os
-import io
-import tempfile
+import time
 
-stream = io.StringIO()
-sys.stdout = stream
-sys.stderr = stream
+## local
+from log_capture import LogCapture
+
+## console output (moviepy, ffmpeg, Qt warnings) goes to a bounded ring
+## buffer instead of piling up for the life of the process
+log_capture = LogCapture()
+sys.stdout = log_capture
+sys.stderr = log_capture
 
 ## PySide6
 from PySide6.QtWidgets import (
 	QApplication, QMainWindow, QLabel, QVBoxLayout,
 	QHBoxLayout, QWidget, QFileDialog,
-	QProgressDialog, QMessageBox
+	QProgressDialog, QMessageBox, QInputDialog
 )
 from PySide6.QtCore import Qt, QTimer, QSettings
-from PySide6.QtGui import QPixmap, QImage, QPainter, QIcon
-
-## non-standard
-from moviepy.editor import ImageSequenceClip
+from PySide6.QtGui import QPixmap, QImage, QPainter, QIcon, QShortcut, QKeySequence
 
 ## local
 from video_controls import VideoControls
@@ -26,6 +27,18 @@ from settings_panel import SettingsPanel
 from image_display import ImageDisplay
 from image_list import ImageList
 from resource_manager import ResourceManager
+from frame_store import FrameStore
+from prefetcher import Prefetcher
+from disk_cache import DiskCache, default_cache_dir
+from telemetry import telemetry
+from telemetry_hud import TelemetryHud
+from frame_composer import FrameComposer, DraftComposer
+from source_cache import SourceCache
+from frame_map import FrameMap, default_map_dir
+from folder_watcher import FolderWatcher
+from sequence_scan import parse_sequence_spec
+from video_exporter import ExportWorker, ExportTarget, RESOLUTIONS, DRAFT_SIZE, DRAFT_PRESET, DRAFT_PARAMS
+from timeline import Timeline
 
 class MainWindow(QMainWindow):
 	def __init__(self):
@@ -39,18 +52,25 @@ class MainWindow(QMainWindow):
 		## and VideoControls objects.
 		base_path = os.path.abspath(os.path.dirname(__file__))
 		self.resource_manager = ResourceManager(base_path)
+
+		## log_buffer_kb caps the in-memory log; log_file also spills it to
+		## a rotating file on disk
+		log_capture.max_chars = int(self.settings.value("log_buffer_kb", 256)) * 1024
+		log_capture.set_log_file(self.settings.value("log_file", ""))
 		
 		self.setup_ui()
 		self.load_settings()
 		self.current_image = 0
-		self.setup_timer()
+		self.export_worker = None
+		self.fps = 24
+
+		## export_segments above 1 splits an export into that many pieces
+		## encoded in parallel processes, then joined without re-encoding
+		self.export_segments = int(self.settings.value("export_segments", 1))
 		self.update_settings()
 		
 		## add the Animator's Pal custom icon to the titlebar
-		icon = QIcon()
-		image = self.resource_manager.get_resource_path("images/bobby_bowtie_icon60x.png")
-		icon.addPixmap(QPixmap(image))
-		self.setWindowIcon(icon)
+		self.setWindowIcon(self.resource_manager.get_icon("images/bobby_bowtie_icon60x.png"))
 
 	def setup_ui(self):
 		main_widget = QWidget()
@@ -62,7 +82,51 @@ class MainWindow(QMainWindow):
 		content_layout = QHBoxLayout()
 		main_layout.addLayout(content_layout)
 
-		self.image_list = ImageList(self)
+		## playback uses preview frames composed once at the display size;
+		## export-resolution frames are only composed when saving a video
+		self.image_display = ImageDisplay()
+
+		## composed preview and export frames are also kept on disk, so
+		## reopening an unchanged sequence skips decoding; 0 turns it off
+		disk_cache_mb = int(self.settings.value("disk_cache_mb", 4096))
+		self.disk_cache = None
+
+		if disk_cache_mb > 0:
+			self.disk_cache = DiskCache(default_cache_dir(), disk_cache_mb * 1024 * 1024)
+
+		## decoded sources are kept apart from composed frames, so a new
+		## resolution or a cleared preview recomposes without re-reading files
+		source_cache_mb = int(self.settings.value("source_cache_mb", 1024))
+		self.source_cache = SourceCache(source_cache_mb * 1024 * 1024)
+
+		## frame_map_mb above 0 writes composed frames into memory-mapped
+		## files (up to that size), so long high-resolution sequences are
+		## paged by the OS rather than composed again
+		frame_map_mb = int(self.settings.value("frame_map_mb", 0))
+		self.frame_map = None
+
+		if frame_map_mb > 0:
+			self.frame_map = FrameMap(default_map_dir(), frame_map_mb * 1024 * 1024)
+
+		self.composer = FrameComposer(self.disk_cache, self.source_cache, self.frame_map)
+
+		## composed frames are cached up to a memory budget (in MB) that can
+		## be tuned per workstation through the settings
+		budget_mb = int(self.settings.value("frame_cache_mb", 1024))
+		self.preview_store = FrameStore(self.compose_preview, budget_mb * 1024 * 1024,
+										self.preview_content_key)
+
+		self.image_list = ImageList(self, self.preview_store)
+		self.image_list.loader.set_frame_size(self.image_display.width(), self.image_display.height())
+		self.image_list.loader.composer = self.composer
+		self.image_list.frame_model.composer = self.composer
+		self.image_list.set_show_thumbnails(self.settings.value("show_thumbnails", "false") == "true")
+		self.image_list.images_added.connect(self.on_images_added)
+		self.image_list.loader.finished.connect(self.on_import_finished)
+		self.image_list.loader.scan_failed.connect(self.on_scan_failed)
+		self.import_error = None
+		self.image_list.image_inserted.connect(self.on_image_inserted)
+		self.image_list.image_updated.connect(self.on_image_updated)
 		content_layout.addWidget(self.image_list)
 
 		right_container = QWidget()
@@ -72,64 +136,63 @@ class MainWindow(QMainWindow):
 		self.settings_panel = SettingsPanel(self, self.resource_manager)
 		right_layout.addLayout(self.settings_panel.layout)
 
-		self.image_display = ImageDisplay()
 		right_layout.addWidget(self.image_display)
 
 		self.video_controls = VideoControls(self, self.resource_manager)
 		self.video_controls.image_changed.connect(self.on_image_changed)
 		right_layout.addWidget(self.video_controls)
 
-	def setup_timer(self):
-		self.timer = QTimer(self)
-		self.timer.timeout.connect(self.switch_image)
-		self.fps = 24
-		self.timer.setInterval(1000 // self.fps)
+		## composes the next few frames in the direction of play on
+		## background threads, so playback rarely waits on a decode
+		depth = int(self.settings.value("prefetch_depth", 8))
+		self.prefetcher = Prefetcher(self.video_controls, self.preview_store, depth, self)
+		self.prefetcher.set_frame_size(self.image_display.width(), self.image_display.height())
+		self.prefetcher.composer = self.composer
+
+		## picks up frames saved into the image folder while it's open
+		self.folder_watcher = FolderWatcher(self)
+		self.folder_watcher.set_frame_size(self.image_display.width(), self.image_display.height())
+		self.folder_watcher.composer = self.composer
+		self.folder_watcher.image_ready.connect(self.on_watched_image)
+
+		## imports pause the watch, so their files aren't picked up twice
+		self.image_list.loader.started.connect(self.folder_watcher.stop)
+		self.image_list.loader.cancelled.connect(self.resume_watch)
+
+		## F3 toggles the playback telemetry overlay; Ctrl+Shift+T saves
+		## what it has recorded as a Chrome trace
+		self.telemetry_hud = TelemetryHud(self.image_display, {
+			"preview": self.preview_store.stats,
+			"sources": self.source_cache.stats,
+			"disk": lambda: self.disk_cache.stats() if self.disk_cache else None,
+			"mapped": lambda: self.frame_map.stats() if self.frame_map else None,
+			"prefetch": self.prefetcher.stats
+		})
+		QShortcut(QKeySequence("F3"), self, self.telemetry_hud.toggle)
+		QShortcut(QKeySequence("Ctrl+Shift+T"), self, self.save_trace)
 
 	def update_settings(self):
-		if self.settings_panel.direction_combo.currentText() == "Forward":
-			self.video_controls.play_direction = 1
-		else:
+		if self.settings_panel.direction_combo.currentText() == "Reverse":
 			self.video_controls.play_direction = -1
+		else:
+			self.video_controls.play_direction = 1
 			
 		self.fps = int(self.settings_panel.fps_combo.currentText())
-		self.timer.setInterval(1000 // self.fps)
 		self.video_controls.set_fps(self.fps)
 
 		resolution = self.settings_panel.resolution_combo.currentText()
 		
-		if resolution == "720p":
-			self.video_width, self.video_height = 1280, 720
-		elif resolution == "1080p":
-			self.video_width, self.video_height = 1920, 1080
-		elif resolution == "4K":
-			self.video_width, self.video_height = 3840, 2160
-		elif resolution == "8K":
-			self.video_width, self.video_height = 7680, 4320
+		self.video_width, self.video_height = RESOLUTIONS[resolution]
 
 		framehold = self.settings_panel.framehold_spin.value()
 		self.video_controls.set_framehold(framehold)
 
-	def reload_images(self):
-		if self.image_list.image_files:
-			self.image_list.clear_images()
-			
-			for img in self.image_list.image_files:
-					processed_img = self.overlay_image_on_background(img)
-					self.image_list.images.append(processed_img)
-					
-			self.switch_image()
+	def compose_preview(self, image_path):
+		return QPixmap.fromImage(self.composer.compose(image_path, self.image_display.width(),
+											self.image_display.height()))
 
-	def overlay_image_on_background(self, image_path):
-		original_image = QImage(image_path)
-		background = QImage(self.video_width, self.video_height, QImage.Format_RGB32)
-		background.fill(Qt.black)
-		painter = QPainter(background)
-		scaled_image = original_image.scaled(self.video_width, self.video_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-		x = (self.video_width - scaled_image.width()) // 2
-		y = (self.video_height - scaled_image.height()) // 2
-		painter.drawImage(x, y, scaled_image)
-		painter.end()
-		return QPixmap.fromImage(background)
+	def preview_content_key(self, image_path):
+		return self.composer.content_key(image_path, self.image_display.width(), self.image_display.height())
 
 	def add_images(self):
 		last_dir = self.settings.value("last_image_dir", os.getcwd())
@@ -139,92 +202,316 @@ class MainWindow(QMainWindow):
 		if files:
 			self.settings.setValue("last_image_dir", os.path.dirname(files[0]))
 
-			self.image_list.load_images(os.path.dirname(files[0]), files, self.overlay_image_on_background)
-			
-			if self.image_list.topLevelItemCount() > 0:
-					self.current_image = 0
-					self.video_controls.set_total_images(self.image_list.topLevelItemCount())
-					self.switch_image()
+			self.image_list.load_images(os.path.dirname(files[0]), files)
 
-	def save_video(self):
-		if self.image_list.topLevelItemCount() == 0:
+	def add_folder(self):
+		## a whole shot folder, or part of one: "shot_####.tif 100-400"
+		last_dir = self.settings.value("last_image_dir", os.getcwd())
+		folder = QFileDialog.getExistingDirectory(self, "Select Image Folder", last_dir)
+
+		if not folder:
 			return
+
+		spec, ok = QInputDialog.getText(self, "Import Folder",
+									"Files to import (pattern and optional frame range, e.g. shot_####.tif 100-400):",
+									text = self.settings.value("import_pattern", "*"))
+
+		if not ok:
+			return
+
+		pattern, frame_range = parse_sequence_spec(spec)
+		self.settings.setValue("last_image_dir", folder)
+		self.settings.setValue("import_pattern", spec.strip() or "*")
+		self.image_list.load_folder(folder, pattern, frame_range)
+
+	def on_images_added(self, first_row, last_row):
+		self.video_controls.set_total_images(self.image_list.row_count())
+
+		## show the first frame as soon as it is ready, without waiting
+		## for the rest of the import
+		if first_row == 0:
+			self.current_image = 0
+			self.switch_image()
+
+	def on_scan_failed(self, message):
+		self.import_error = f"The folder couldn't be read: {message}"
+		self.statusBar().showMessage(self.import_error)
+
+	def on_import_finished(self):
+		self.resume_watch()
+		import_error, self.import_error = self.import_error, None
+
+		if self.image_list.row_count() == 0:
+			return
+
+		## copies of a drawing share one preview frame
+		duplicate_frames = self.preview_store.duplicate_frames
+		frame_bytes = self.image_display.width() * self.image_display.height() * 4
+		message = f"{self.image_list.row_count()} frames imported"
+
+		if duplicate_frames:
+			message += (f", {duplicate_frames} duplicates share memory,"
+						f" saving {duplicate_frames * frame_bytes / (1024 * 1024):.0f} MB")
+
+		message += "."
+
+		## a scan that failed part way keeps its error in view
+		if import_error is not None:
+			message += f" {import_error}"
+
+		self.statusBar().showMessage(message)
+
+	def save_video(self):
+		file_path = self.choose_video_file("Save Video")
+
+		if file_path:
+			self.create_video(file_path)
+
+	def save_draft(self):
+		file_path = self.choose_video_file("Save Draft Video")
+
+		if file_path:
+			self.create_video(file_path, draft = True)
+
+	def choose_video_file(self, title):
+		if self.image_list.row_count() == 0:
+			return None
+
+		if self.export_worker is not None:
+			QMessageBox.information(self, "Saving Video", "A video is already being saved.")
+			return None
 		
 		last_dir = self.settings.value("last_video_dir", os.getcwd())
-		file_path, _ = QFileDialog.getSaveFileName(self, "Save Video", last_dir, "MP4 Files (*.mp4)")
+		file_path, _ = QFileDialog.getSaveFileName(self, title, last_dir, "MP4 Files (*.mp4)")
 		
 		if file_path:
 			self.settings.setValue("last_video_dir", os.path.dirname(file_path))
 			
 			if not file_path.lower().endswith('.mp4'):
 					file_path += '.mp4'
-					
-			self.create_video(file_path)
+
+		return file_path
+
+	def toggle_watch(self, checked):
+		if not checked:
+			self.folder_watcher.stop()
+			self.statusBar().showMessage("Stopped watching for new frames.")
+			return
+
+		## files an import hasn't added yet would look new to the watcher and
+		## go in twice, so watching waits until the import is done
+		if self.image_list.loader.is_loading():
+			self.statusBar().showMessage("Watching for new frames once the import has finished.")
+			return
+
+		folder = self.start_watch()
+		self.statusBar().showMessage(f"Watching {folder} for new frames.")
+
+	def start_watch(self):
+		## the folder the list came from; an empty list watches the folder
+		## images were last added from
+		if self.preview_store.image_files:
+			folder = os.path.dirname(self.preview_store.image_files[0])
+		else:
+			folder = self.settings.value("last_image_dir", os.getcwd())
+
+		self.folder_watcher.watch(folder, self.preview_store.image_files)
+		return folder
+
+	def resume_watch(self):
+		## an import stops the watch while it runs; it picks up again here
+		## knowing the imported files
+		if self.settings_panel.watch_button.isChecked() and not self.folder_watcher.is_watching():
+			self.start_watch()
+
+	def on_watched_image(self, image_path, image, changed):
+		if changed:
+			self.image_list.update_image(image_path, image)
+		else:
+			self.image_list.insert_image(image_path, image)
+
+	def on_image_inserted(self, row):
+		self.video_controls.set_total_images(self.image_list.row_count())
+
+		## keep showing the same frame when one is inserted before it
+		if self.image_list.row_count() > 1 and row <= self.current_image:
+			self.current_image += 1
+			self.video_controls.current_image = self.current_image
+
+		self.prefetcher.cancel()
+		self.switch_image()
+
+	def on_image_updated(self, row):
+		self.prefetcher.cancel()
+
+		if row == self.current_image:
+			self.switch_image()
 
 	def switch_image(self, index = None):
 		if index is not None:
 			self.current_image = index
 		
-		if self.image_list.topLevelItemCount() > 0:
+		if self.image_list.row_count() > 0:
 			self.current_image = min(self.current_image,
-									self.image_list.topLevelItemCount() - 1)
+									self.image_list.row_count() - 1)
 			
-			self.image_display.switch_image(self.image_list.images[self.current_image])
-			current_item = self.image_list.topLevelItem(self.current_image)
-			self.image_list.setCurrentItem(current_item)
+			with telemetry.span("switch_image", frame = self.current_image):
+				if self.video_controls.is_playing:
+					self.prefetcher.note_request(self.current_image)
+
+				self.image_display.switch_image(self.preview_store.get_frame(self.current_image))
+				self.image_list.select_row(self.current_image)
+
+			if telemetry.enabled:
+				telemetry.record_counter("preview_cache", {"hit_rate": self.preview_store.stats()["hit_rate"]})
+
+	def save_trace(self):
+		file_path, _ = QFileDialog.getSaveFileName(self, "Save Playback Trace", os.getcwd(), "Trace Files (*.json)")
+
+		if file_path:
+			telemetry.dump_chrome_trace(file_path)
 
 	def on_image_changed(self, index):
 		self.current_image = index
 		self.switch_image(self.current_image)
 
-	def create_video(self, output_filename):
-		if self.image_list.topLevelItemCount() == 0:
+	def create_video(self, output_filename, draft = False):
+		if self.image_list.row_count() == 0:
 			return
 
-		progress = QProgressDialog("Saving video. Please wait.", "Cancel", 0, self.image_list.topLevelItemCount(), self)
-		progress.setWindowModality(Qt.WindowModal)
-		progress.setWindowTitle("Saving Video")
-
-		try:
-			with tempfile.TemporaryDirectory() as tmpdirname:
-				scaled_image_files = []
-				
-				if self.settings_panel.direction_combo.currentText() == "Reverse":
-						image_sequence = reversed(self.image_list.images)
-				else:
-						image_sequence = self.image_list.images
-
-				for i, img in enumerate(image_sequence):
-						if progress.wasCanceled():
-							return
-						
-						# Scale the image to the correct resolution
-						scaled_img = img.scaled(self.video_width, self.video_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-						
-						for _ in range(self.video_controls.framehold):
-							temp_file = os.path.join(tmpdirname, 
-											f"scaled_image_{len(scaled_image_files):04d}.png")
-							
-							# Save the scaled image
-							scaled_img.save(temp_file, "PNG")
-							scaled_image_files.append(temp_file)
-						
-						progress.setValue(i + 1)
-
-				progress.setLabelText("Encoding video...")
-				clip = ImageSequenceClip(scaled_image_files, fps=self.fps)
-				clip.write_videofile(output_filename, codec='libx264')
-				progress.setValue(self.image_list.topLevelItemCount())
-		except Exception as e:
-			QMessageBox.critical(self, "Error", f"An error occurred while saving the video: {str(e)}")
-		finally:
-			progress.close()
+		## the frames are read off the timeline as they're encoded, so a long
+		## bounced, looped sequence is never laid out in full
+		image_sequence = self.preview_store.image_files
+		timeline = self.export_timeline()
+		self.export_draft = draft
+		self.export_resolution = self.settings_panel.resolution_combo.currentText()
+
+		## the render runs on its own thread so frames can still be flipped
+		## while it encodes
+		if draft:
+			## shrunk preview frames and a fast, animation-tuned encode
+			composer = DraftComposer(self.composer, (self.image_display.width(), self.image_display.height()))
+			self.export_worker = ExportWorker(image_sequence, output_filename, *DRAFT_SIZE, self.fps,
+										self.video_controls.framehold, composer, log_capture, segments = 1,
+										preset = DRAFT_PRESET, ffmpeg_params = DRAFT_PARAMS, timeline = timeline,
+										parent = self)
+		else:
+			extra_targets = self.extra_targets(output_filename)
+
+			if extra_targets is None:
+				self.statusBar().showMessage("Video not saved.")
+				return
+
+			self.export_worker = ExportWorker(image_sequence, output_filename, self.video_width, self.video_height,
+										self.fps, self.video_controls.framehold, self.composer, log_capture,
+										self.export_segments, timeline = timeline, extra_targets = extra_targets,
+										parent = self)
+
+		self.export_worker.progress.connect(self.on_export_progress)
+		self.export_worker.export_finished.connect(self.on_export_saved)
+		self.export_worker.export_cancelled.connect(self.on_export_finished)
+		self.export_worker.export_failed.connect(self.on_export_failed)
+		self.export_worker.encoder_progress.connect(self.on_encoder_progress)
+		self.encoder_status = ""
+
+		total_frames = len(self.export_worker.timeline)
+		self.export_progress = QProgressDialog("Saving video. Please wait.", "Cancel", 0, total_frames, self)
+		self.export_progress.setWindowTitle("Saving Video")
+		self.export_progress.setAutoClose(False)
+		self.export_progress.setAutoReset(False)
+		self.export_progress.canceled.connect(self.export_worker.cancel)
+		self.export_progress.show()
+
+		self.export_worker.start()
+
+	def extra_targets(self, output_filename):
+		## the copy at the second resolution is saved next to the first,
+		## named for its resolution: shot.mp4 and shot_1080p.mp4
+		extra_resolution = self.settings_panel.extra_resolution_combo.currentText()
+
+		if extra_resolution not in RESOLUTIONS or extra_resolution == self.export_resolution:
+			return []
+
+		extra_filename = f"{os.path.splitext(output_filename)[0]}_{extra_resolution}.mp4"
+
+		## the save dialog only asked about the first file; None means don't save
+		if os.path.exists(extra_filename):
+			answer = QMessageBox.question(self, "Save Video",
+										f"{os.path.basename(extra_filename)} already exists. Replace it?")
+
+			if answer != QMessageBox.Yes:
+				return None
+
+		return [ExportTarget(extra_filename, *RESOLUTIONS[extra_resolution])]
+
+	def export_timeline(self):
+		frame_count = len(self.preview_store)
+		mode = self.settings_panel.direction_combo.currentText().lower()
+		loops = self.settings_panel.loops_spin.value()
+		return Timeline(frame_count, self.video_controls.framehold, segments = [(0, frame_count - 1, mode, loops)])
+
+	def on_export_progress(self, frames_written, total_frames, eta):
+		self.export_progress.setLabelText(
+			f"Encoding frame {frames_written} of {total_frames}, about {round(eta)} s left.{self.encoder_status}")
+		self.export_progress.setValue(frames_written)
+
+	def on_encoder_progress(self, frame, fps, bitrate):
+		self.encoder_status = f"\nEncoder: frame {frame}, {fps:g} fps, {bitrate}"
+
+	def on_export_saved(self, output_filename):
+		elapsed = time.monotonic() - self.export_worker.start_time
+		total_frames = len(self.export_worker.timeline)
+		timing_key = f"export_seconds_per_frame/{self.export_resolution}"
+
+		## full renders are timed per frame at each resolution, so a draft can
+		## say what it saved over a full render of the same sequence
+		if self.export_draft:
+			seconds_per_frame = self.settings.value(timing_key)
+
+			if seconds_per_frame is None:
+				full_time = f"no full {self.export_resolution} render has been timed yet"
+			else:
+				full_time = (f"a full {self.export_resolution} render takes about"
+							f" {float(seconds_per_frame) * total_frames:.1f} s")
+
+			message = f"Draft saved in {elapsed:.1f} s; {full_time}."
+		else:
+			## a render with extra targets took longer than this resolution alone
+			if len(self.export_worker.targets) == 1:
+				self.settings.setValue(timing_key, elapsed / total_frames)
+
+			saved_files = ", ".join(os.path.basename(target.output_filename) for target in self.export_worker.targets)
+			message = f"Saved {saved_files} in {elapsed:.1f} s."
+
+		self.on_export_finished()
+		self.statusBar().showMessage(message)
+
+	def on_export_finished(self):
+		self.export_progress.close()
+		self.export_worker.wait()
+		self.export_worker.deleteLater()
+		self.export_worker = None
+
+	def on_export_failed(self, message):
+		self.on_export_finished()
+		QMessageBox.critical(self, "Error", f"An error occurred while saving the video: {message}")
 
 	def new_project(self):
+		self.prefetcher.cancel()
+		self.folder_watcher.stop()
+		self.settings_panel.watch_button.setChecked(False)
 		self.image_list.clear_images()
+		self.source_cache.clear()
+
+		if self.frame_map is not None:
+			self.frame_map.clear()
 		self.image_display.create_black_background()
 
 	def closeEvent(self, event):
+		if self.export_worker is not None:
+			self.export_worker.cancel()
+			self.export_worker.wait()
+
 		self.save_settings()
 		super().closeEvent(event)
 
@@ -0,0 +1,77 @@
+from PySide6.QtCore import QObject, QThreadPool
+from PySide6.QtGui import QPixmap
+
+## local
+from image_loader import LoaderSignals, ComposeTask
+from frame_composer import FrameComposer
+
+class Prefetcher(QObject):
+	def __init__(self, video_controls, frame_store, depth = 8, parent = None):
+		super().__init__(parent)
+		self.video_controls = video_controls
+		self.frame_store = frame_store
+		self.depth = depth
+		self.pool = QThreadPool(self)
+		self.signals = LoaderSignals()
+		self.signals.composed.connect(self.on_composed)
+		self.generation = 0
+		self.frame_size = (1280, 720)
+		self.composer = FrameComposer()
+		self.in_flight = set()
+		self.playback_requests = 0
+		self.playback_stalls = 0
+
+		self.video_controls.image_changed.connect(self.prefetch)
+
+	def set_frame_size(self, width, height):
+		self.frame_size = (width, height)
+
+	def prefetch(self, index):
+		if not self.video_controls.is_playing:
+			return
+
+		## the same timeline playback reads from, so bounce turns the window
+		## round, looping wraps it and held drawings are only fetched once
+		upcoming_frames = self.video_controls.upcoming_images(self.depth)
+
+		## keep the read-ahead window at the recent end of the LRU, nearest
+		## frame last, so frames about to play are evicted after ones behind
+		for upcoming in reversed(upcoming_frames):
+			self.frame_store.touch(upcoming)
+
+		for upcoming in upcoming_frames:
+			if upcoming in self.in_flight or self.frame_store.has_frame(upcoming):
+				continue
+			
+			self.in_flight.add(upcoming)
+			image_path = self.frame_store.image_files[upcoming]
+			self.pool.start(ComposeTask(self, self.generation, upcoming, image_path))
+
+	def on_composed(self, generation, index, image):
+		if generation != self.generation:
+			return
+
+		self.in_flight.discard(index)
+
+		if not self.frame_store.has_frame(index):
+			self.frame_store.put_frame(index, QPixmap.fromImage(image))
+
+	def note_request(self, index):
+		## called before a frame is shown during playback; a frame that is
+		## not cached yet means playback had to wait for it to be composed
+		self.playback_requests += 1
+		
+		if not self.frame_store.has_frame(index):
+			self.playback_stalls += 1
+
+	def cancel(self):
+		self.generation += 1
+		self.pool.clear()
+		self.in_flight.clear()
+
+	def stats(self):
+		return {
+			"requests": self.playback_requests,
+			"stalls": self.playback_stalls,
+			"stall_rate": self.playback_stalls / self.playback_requests if self.playback_requests else 0.0
+		}
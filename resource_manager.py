@@ -2,9 +2,23 @@
 import os
 import sys
 
+## GUI library
+from PySide6.QtGui import QIcon, QPixmap
+
+## the compiled Qt resource bundle is optional; build it with
+##    pyside6-rcc images.qrc -o images_rc.py
+## and icons are read from it instead of from the images folder
+try:
+   import images_rc
+   HAVE_COMPILED_RESOURCES = True
+except ImportError:
+   HAVE_COMPILED_RESOURCES = False
+
 class ResourceManager:
    def __init__(self, base_path) -> None:
       self.base_path = base_path
+      self.pixmaps = {}
+      self.icons = {}
       
    def get_resource_path(self, relative_path):
       if getattr(sys, 'frozen', False):
@@ -14,3 +28,29 @@ class ResourceManager:
          ## running in a normal Python environment
          return os.path.join(self.base_path, relative_path)
 
+   def get_pixmap(self, relative_path):
+      ## every UI image is loaded once and shared after that
+      pixmap = self.pixmaps.get(relative_path)
+
+      if pixmap is None:
+         if HAVE_COMPILED_RESOURCES:
+            pixmap = QPixmap(f":/{relative_path}")
+         else:
+            pixmap = QPixmap(self.get_resource_path(relative_path))
+         self.pixmaps[relative_path] = pixmap
+
+      return pixmap
+
+   def get_icon(self, up_path, down_path = None):
+      ## with a down image, the icon shows it when the button is checked
+      icon = self.icons.get((up_path, down_path))
+
+      if icon is None:
+         icon = QIcon()
+         icon.addPixmap(self.get_pixmap(up_path), QIcon.Normal, QIcon.Off)
+
+         if down_path is not None:
+            icon.addPixmap(self.get_pixmap(down_path), QIcon.Normal, QIcon.On)
+         self.icons[(up_path, down_path)] = icon
+
+      return icon
@@ -0,0 +1,118 @@
+## Python standard
+import os
+import queue
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+## local
+from batch_render import init_worker, available_cores
+from video_exporter import write_frames, timeline_runs
+from timeline import Timeline
+
+## a keyframe every GOP_SECONDS; segments always start on one of them
+GOP_SECONDS = 2
+
+def plan_segments(total_frames, segments, gop_size):
+	## split the output into at most `segments` ranges of whole GOPs, as
+	## (first frame, end frame); a hold can straddle a cut
+	total_gops = -(-total_frames // gop_size)
+	segment_frames = -(-total_gops // max(1, segments)) * gop_size
+
+	return [(first_frame, min(first_frame + segment_frames, total_frames))
+			for first_frame in range(0, total_frames, segment_frames)]
+
+def encode_segment(index, image_files, timeline, first_frame, last_frame, output_filename, width, height, fps,
+				gop_size, disk_cache_args, progress_queue, stop_event):
+	## runs in a worker process with its own composer; the disk cache is
+	## shared with the GUI through the files, not the object, and the frames
+	## come off the timeline as they're written
+	from frame_composer import FrameComposer
+	from disk_cache import DiskCache
+
+	composer = FrameComposer(DiskCache(*disk_cache_args) if disk_cache_args is not None else None)
+
+	def progress(frames_written, total_frames):
+		progress_queue.put((index, frames_written))
+		return not stop_event.is_set()
+
+	## every segment gets the same fixed GOP and no scene-cut keyframes, so
+	## the pieces line up and can be joined without re-encoding
+	ffmpeg_params = ["-g", str(gop_size), "-keyint_min", str(gop_size), "-sc_threshold", "0"]
+	return write_frames(timeline_runs(image_files, timeline, first_frame, last_frame), output_filename, width,
+					height, fps, progress, composer = composer, ffmpeg_params = ffmpeg_params,
+					total_frames = last_frame - first_frame)
+
+def concat_segments(segment_files, output_filename):
+	from moviepy.config import get_setting
+
+	list_filename = os.path.join(os.path.dirname(segment_files[0]), "segments.txt")
+
+	with open(list_filename, "w", encoding = "utf-8") as list_file:
+		for segment_filename in segment_files:
+			## the concat demuxer's quoting: close the quote, escape, reopen
+			escaped = segment_filename.replace("'", "'\\''")
+			list_file.write(f"file '{escaped}'\n")
+
+	subprocess.run([get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+				"-i", list_filename, "-c", "copy", output_filename], check = True, capture_output = True)
+
+def write_segmented_video(image_files, output_filename, width, height, fps, framehold, segments,
+						progress_callback = None, disk_cache = None, timeline = None):
+	## encodes GOP-aligned pieces of the sequence in parallel processes and
+	## joins them with ffmpeg's concat demuxer; returns False if cancelled
+	if timeline is None:
+		timeline = Timeline(len(image_files), framehold)
+
+	gop_size = fps * GOP_SECONDS
+	total_frames = len(timeline)
+	plan = plan_segments(total_frames, segments, gop_size)
+	disk_cache_args = (disk_cache.cache_dir, disk_cache.max_bytes) if disk_cache is not None else None
+
+	## the pieces are written next to the output so joining them doesn't
+	## copy across file systems
+	temp_dir = tempfile.mkdtemp(prefix = ".segments-", dir = os.path.dirname(os.path.abspath(output_filename)))
+	segment_files = [os.path.join(temp_dir, f"segment{index:04d}.mp4") for index in range(len(plan))]
+
+	## spawn, not fork: the GUI process has Qt and its threads running
+	context = multiprocessing.get_context("spawn")
+	manager = context.Manager()
+
+	try:
+		progress_queue = manager.Queue()
+		stop_event = manager.Event()
+		frames_written = [0] * len(plan)
+		workers = max(1, min(len(plan), available_cores()))
+
+		with ProcessPoolExecutor(max_workers = workers, mp_context = context, initializer = init_worker) as pool:
+			futures = [pool.submit(encode_segment, index, image_files, timeline, first_frame, last_frame,
+								segment_files[index], width, height, fps, gop_size, disk_cache_args,
+								progress_queue, stop_event)
+					for index, (first_frame, last_frame) in enumerate(plan)]
+
+			## keep reading after the last segment is done, until its final
+			## progress report has come through too
+			while not all(future.done() for future in futures) or not progress_queue.empty():
+				try:
+					index, written = progress_queue.get(timeout = 0.1)
+				except queue.Empty:
+					continue
+
+				frames_written[index] = written
+
+				if progress_callback is not None and not progress_callback(sum(frames_written), total_frames):
+					stop_event.set()
+
+			## re-raises the first segment's error, if any
+			completed = all([future.result() for future in futures])
+
+		if not completed or stop_event.is_set():
+			return False
+
+		concat_segments(segment_files, output_filename)
+		return True
+	finally:
+		manager.shutdown()
+		shutil.rmtree(temp_dir, ignore_errors = True)
@@ -0,0 +1,122 @@
+## Python standard
+import os
+import re
+
+## local
+from frame_composer import IMAGE_EXTENSIONS
+
+DIGITS = re.compile(r"\d+")
+
+## matches found during a scan are handed on this many at a time
+SCAN_BATCH = 512
+
+def pad_number(match):
+	digits = match.group().lstrip("0") or "0"
+	return f"{len(digits):03d}{digits}"
+
+def natural_key(name):
+	## frame2 before frame10, and the same order on every platform: text
+	## compares without case, and each run of digits is prefixed with its
+	## length so numbers compare by value; a flat string sorts much faster
+	## than a tuple of parts. The name itself breaks ties, so frame01 and
+	## frame1 still come out in a fixed order
+	return DIGITS.sub(pad_number, name.casefold()), name
+
+def compile_pattern(pattern):
+	## glob wildcards plus # for each digit of a frame number, so shot_####.tif
+	## matches shot_0100.tif and captures 0100 (a longer number still matches)
+	regex = ""
+	captured = False
+
+	for token in re.findall(r"#+|\*|\?|[^#*?]+", pattern):
+		if token.startswith("#"):
+			## only the first run of #'s is the frame number
+			digits = rf"\d{{{len(token)},}}"
+			regex += digits if captured else f"({digits})"
+			captured = True
+		elif token == "*":
+			regex += ".*"
+		elif token == "?":
+			regex += "."
+		else:
+			regex += re.escape(token)
+
+	return re.compile(regex + r"\Z", re.IGNORECASE | re.DOTALL)
+
+def parse_frame_range(text):
+	## "100-400" or a single frame, "100"
+	match = re.fullmatch(r"\s*(\d+)\s*(?:-\s*(\d+)\s*)?", text)
+
+	if match is None:
+		raise ValueError(f"Not a frame range: {text!r}")
+
+	first = int(match.group(1))
+	last = int(match.group(2)) if match.group(2) is not None else first
+	return min(first, last), max(first, last)
+
+def parse_sequence_spec(text):
+	## "shot_####.tif 100-400" -> ("shot_####.tif", (100, 400)); either part
+	## may be left out
+	pattern, frame_range = text.strip(), None
+	head, _, tail = pattern.rpartition(" ")
+
+	if tail and re.fullmatch(r"\d+(?:-\d+)?", tail):
+		pattern, frame_range = head.strip(), parse_frame_range(tail)
+
+	return pattern or "*", frame_range
+
+def frame_number(name, match):
+	## the number the #'s captured, or else the last number in the name
+	if match is not None and match.groups():
+		return int(match.group(1))
+
+	numbers = DIGITS.findall(name)
+	return int(numbers[-1]) if numbers else None
+
+def name_filter(pattern = None, frame_range = None):
+	## a test for file names: an image, matching pattern, in frame_range
+	regex = compile_pattern(pattern) if pattern and pattern != "*" else None
+
+	def accept(name):
+		if not name.lower().endswith(IMAGE_EXTENSIONS):
+			return False
+
+		match = regex.match(name) if regex is not None else None
+
+		if regex is not None and match is None:
+			return False
+
+		if frame_range is not None:
+			number = frame_number(name, match)
+			return number is not None and frame_range[0] <= number <= frame_range[1]
+
+		return True
+
+	return accept
+
+def scan_folder(folder, pattern = None, frame_range = None):
+	## streams (sort key, path) batches out of os.scandir as entries come in,
+	## so work can start on the first files before a huge folder is listed;
+	## is_file() comes from the directory entry, so nothing is stat'ed
+	accept = name_filter(pattern, frame_range)
+	batch = []
+
+	with os.scandir(folder) as entries:
+		for entry in entries:
+			if not accept(entry.name) or not entry.is_file():
+				continue
+
+			batch.append((natural_key(entry.name), entry.path))
+
+			if len(batch) >= SCAN_BATCH:
+				yield batch
+				batch = []
+
+	if batch:
+		yield batch
+
+def list_sequence(folder, pattern = None, frame_range = None):
+	## every matching image in the folder, in natural order
+	found = [item for batch in scan_folder(folder, pattern, frame_range) for item in batch]
+	found.sort()
+	return [image_path for _, image_path in found]
@@ -26,32 +26,52 @@ class SettingsPanel:
 
 	def setup_ui(self):
 		## Add Images button set-up
-		up_image = self.resource_manager.get_resource_path(f"{self.buttons['add_images'][0]}")
-		down_image = self.resource_manager.get_resource_path(f"{self.buttons['add_images'][1]}")
-		self.add_images_button = ImageButton(up_image, down_image)
+		up_image, down_image = self.buttons['add_images']
+		self.add_images_button = ImageButton(up_image, down_image, self.resource_manager)
 		self.add_images_button.clicked.connect(self.parent.add_images)
 		self.add_images_button.setToolTip("Add images to the list")
 		self.layout.addWidget(self.add_images_button)
+
+		## Folder button set-up, for importing a whole shot folder or a frame range of one
+		self.add_folder_button = QPushButton("Folder")
+		self.add_folder_button.setFixedSize(64, 64)
+		self.add_folder_button.clicked.connect(self.parent.add_folder)
+		self.add_folder_button.setToolTip("Add every image in a folder, or those matching a pattern and frame range")
+		self.layout.addWidget(self.add_folder_button)
+
+		## Watch button set-up, for frames saved into the image folder later
+		self.watch_button = QPushButton("Watch")
+		self.watch_button.setFixedSize(64, 64)
+		self.watch_button.setCheckable(True)
+		self.watch_button.toggled.connect(self.parent.toggle_watch)
+		self.watch_button.setToolTip("Add frames saved into the image folder as they appear")
+		self.layout.addWidget(self.watch_button)
 		
 		self.layout.addStretch()
 		self.setup_combo_boxes()
 		self.setup_framehold()
+		self.setup_loops()
 		self.layout.addStretch()
 
 		## Save Video button set-up
-		up_image = self.resource_manager.get_resource_path(f"{self.buttons['save_video'][0]}")
-		down_image = self.resource_manager.get_resource_path(f"{self.buttons['save_video'][1]}")
-		self.save_video_button = ImageButton(up_image, down_image)
+		up_image, down_image = self.buttons['save_video']
+		self.save_video_button = ImageButton(up_image, down_image, self.resource_manager)
 		self.save_video_button.clicked.connect(self.parent.save_video)
 		self.save_video_button.setToolTip("Save the video file")
 		self.layout.addWidget(self.save_video_button)
 
+		## Draft button set-up, for a quick low-res render to review
+		self.save_draft_button = QPushButton("Draft")
+		self.save_draft_button.setFixedSize(64, 64)
+		self.save_draft_button.clicked.connect(self.parent.save_draft)
+		self.save_draft_button.setToolTip("Save a quick low-resolution draft video for review")
+		self.layout.addWidget(self.save_draft_button)
+
 		self.layout.addStretch()
 
 		## New button set-up
-		up_image = self.resource_manager.get_resource_path(f"{self.buttons['new'][0]}")
-		down_image = self.resource_manager.get_resource_path(f"{self.buttons['new'][1]}")
-		self.new_button = ImageButton(up_image, down_image)
+		up_image, down_image = self.buttons['new']
+		self.new_button = ImageButton(up_image, down_image, self.resource_manager)
 		self.new_button.clicked.connect(self.parent.new_project)
 		self.new_button.setToolTip("Clear the image list and start a new project")
 		self.layout.addWidget(self.new_button)
@@ -93,7 +113,16 @@ class SettingsPanel:
 		self.resolution_combo.setCurrentText(self.settings.value("resolution", "1080p"))
 		self.resolution_combo.currentTextChanged.connect(self.update_settings)
 
+		## a second resolution saved in the same pass, e.g. a 1080p review
+		## copy next to a 4K master
+		self.extra_resolution_combo = QComboBox()
+		self.extra_resolution_combo.addItems(["None", "720p", "1080p", "4K", "8K"])
+		self.extra_resolution_combo.setCurrentText(self.settings.value("extra_resolution", "None"))
+		self.extra_resolution_combo.setToolTip("Also save a copy at this resolution, rendered in the same pass")
+		self.extra_resolution_combo.currentTextChanged.connect(self.update_settings)
+
 		resolution_layout.addWidget(self.resolution_combo)
+		resolution_layout.addWidget(self.extra_resolution_combo)
 
 		self.layout.addWidget(resolution_group)
 		self.layout.addSpacing(10)
@@ -115,7 +144,7 @@ class SettingsPanel:
 		direction_group, direction_layout = self.build_group_layout("Direction")
 		## Direction widgets
 		self.direction_combo = QComboBox()
-		self.direction_combo.addItems(["Forward", "Reverse"])
+		self.direction_combo.addItems(["Forward", "Reverse", "Bounce"])
 		self.direction_combo.setCurrentText(self.settings.value("direction", "Forward"))
 		self.direction_combo.currentTextChanged.connect(self.update_settings)
 
@@ -133,9 +162,8 @@ class SettingsPanel:
 		self.framehold_spin.setValue(int(self.settings.value("framehold", 1)))
 		self.framehold_spin.valueChanged.connect(self.update_settings)
 
-		up_image = self.resource_manager.get_resource_path(f"{self.buttons['reset'][0]}")
-		down_image = self.resource_manager.get_resource_path(f"{self.buttons['reset'][1]}")
-		reset_button = ImageButton(up_image, down_image)
+		up_image, down_image = self.buttons['reset']
+		reset_button = ImageButton(up_image, down_image, self.resource_manager)
 		reset_button.setToolTip("Reset framehold to '1'")
 		reset_button.clicked.connect(self.reset_framehold)
 
@@ -145,11 +173,28 @@ class SettingsPanel:
 		self.layout.addWidget(framehold_group)
 		self.layout.addSpacing(10)
 
+	## Loops widgets: how many times the sequence plays in a saved video
+	def setup_loops(self):
+		loops_group, loops_layout = self.build_group_layout("Loops")
+
+		self.loops_spin = QSpinBox()
+		self.loops_spin.setRange(1, 99)
+		self.loops_spin.setValue(int(self.settings.value("loops", 1)))
+		self.loops_spin.setToolTip("Play the sequence this many times over in the saved video")
+		self.loops_spin.valueChanged.connect(self.update_settings)
+
+		loops_layout.addWidget(self.loops_spin)
+
+		self.layout.addWidget(loops_group)
+		self.layout.addSpacing(10)
+
 	def update_settings(self):
 		self.settings.setValue("direction", self.direction_combo.currentText())
 		self.settings.setValue("fps", self.fps_combo.currentText())
 		self.settings.setValue("resolution", self.resolution_combo.currentText())
+		self.settings.setValue("extra_resolution", self.extra_resolution_combo.currentText())
 		self.settings.setValue("framehold", self.framehold_spin.value())
+		self.settings.setValue("loops", self.loops_spin.value())
 		self.parent.update_settings()
 
 	def reset_framehold(self):
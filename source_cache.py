@@ -0,0 +1,114 @@
+## Python standard
+import os
+import threading
+from collections import OrderedDict
+
+## PySide6
+from PySide6.QtCore import Qt
+
+class SourceCache:
+	def __init__(self, budget_bytes, master_size = (3840, 2160)):
+		## decoded source images, shared by every composer thread, so a frame
+		## can be recomposed at another size without reading its file again;
+		## large JPEGs come already reduced for the frame they were decoded
+		## for, anything bigger than master_size is kept reduced to it, and a
+		## reduced master is only decoded again when a target needs more
+		## detail than it has
+		self.budget_bytes = budget_bytes
+		self.master_size = master_size
+		self.lock = threading.Lock()
+		self.sources = OrderedDict()
+		self.used_bytes = 0
+		self.hits = 0
+		self.misses = 0
+
+	def image_bytes(self, image):
+		return image.sizeInBytes()
+
+	def get(self, image_path, width, height, decode):
+		## returns (image, source width, source height), as does
+		## decode(image_path, width, height), which is only called on a miss,
+		## outside the lock; the image may be reduced to fit width x height
+		try:
+			source = os.stat(image_path)
+			stamp = (source.st_mtime_ns, source.st_size)
+		except OSError:
+			stamp = None
+
+		with self.lock:
+			entry = self.sources.get(image_path)
+
+			if entry is not None and entry[0] == stamp and self.covers(entry, width, height):
+				self.hits += 1
+				self.sources.move_to_end(image_path)
+				return entry[1], entry[3], entry[4]
+
+			self.misses += 1
+
+		image, source_width, source_height = decode(image_path, width, height)
+
+		if image.isNull() or stamp is None:
+			return image, source_width, source_height
+
+		master = image
+		master_width, master_height = self.master_size
+
+		if image.width() > master_width or image.height() > master_height:
+			master = image.scaled(master_width, master_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+		reduced = master.width() < source_width
+		self.put(image_path, (stamp, master, reduced, source_width, source_height))
+		return image, source_width, source_height
+
+	def covers(self, entry, width, height):
+		## a reduced master serves any target it is at least as big as,
+		## once the source is fitted into that target
+		_, master, reduced, source_width, source_height = entry
+
+		if not reduced:
+			return True
+
+		scale = min(width / source_width, height / source_height)
+		return master.width() >= round(source_width * scale) and master.height() >= round(source_height * scale)
+
+	def put(self, image_path, entry):
+		with self.lock:
+			old_entry = self.sources.pop(image_path, None)
+
+			if old_entry is not None:
+				self.used_bytes -= self.image_bytes(old_entry[1])
+
+			self.sources[image_path] = entry
+			self.used_bytes += self.image_bytes(entry[1])
+			self.evict()
+
+	def evict(self):
+		## called with the lock held; like FrameStore, keeps the newest source
+		while self.used_bytes > self.budget_bytes and len(self.sources) > 1:
+			_, old_entry = self.sources.popitem(last = False)
+			self.used_bytes -= self.image_bytes(old_entry[1])
+
+	def set_budget(self, budget_bytes):
+		with self.lock:
+			self.budget_bytes = budget_bytes
+			self.evict()
+
+	def clear(self):
+		with self.lock:
+			self.sources.clear()
+			self.used_bytes = 0
+			self.hits = 0
+			self.misses = 0
+
+	def stats(self):
+		with self.lock:
+			requests = self.hits + self.misses
+
+			return {
+				"hits": self.hits,
+				"misses": self.misses,
+				"hit_rate": self.hits / requests if requests else 0.0,
+				"cached_sources": len(self.sources),
+				"used_bytes": self.used_bytes,
+				"budget_bytes": self.budget_bytes
+			}
@@ -0,0 +1,120 @@
+## Python standard
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+class Telemetry:
+	def __init__(self, max_events = 200000, window = 120):
+		## off by default; every hook checks enabled first so an idle
+		## session pays next to nothing for it
+		self.enabled = False
+		self.origin_ns = time.perf_counter_ns()
+		self.events = deque(maxlen = max_events)
+		self.window = window
+		self.recent = {}
+		self.presentations = deque(maxlen = window)
+		self.dropped_frames = 0
+		self.lock = threading.Lock()
+
+	def now_us(self):
+		return (time.perf_counter_ns() - self.origin_ns) / 1000
+
+	def reset(self):
+		with self.lock:
+			self.origin_ns = time.perf_counter_ns()
+			self.events.clear()
+			self.recent.clear()
+			self.presentations.clear()
+			self.dropped_frames = 0
+
+	@contextmanager
+	def span(self, name, category = "frame", **args):
+		if not self.enabled:
+			yield
+			return
+
+		start_us = self.now_us()
+		
+		try:
+			yield
+		finally:
+			self.add_span(name, category, start_us, self.now_us() - start_us, args)
+
+	def add_span(self, name, category, start_us, duration_us, args = None):
+		event = {"name": name, "cat": category, "ph": "X", "ts": start_us, "dur": duration_us,
+				"pid": os.getpid(), "tid": threading.get_ident()}
+		
+		if args:
+			event["args"] = args
+
+		with self.lock:
+			self.events.append(event)
+			self.recent.setdefault(name, deque(maxlen = self.window)).append(duration_us)
+
+	def record_presentation(self, index, intended_ns, actual_ns, dropped):
+		## intended and actual are on the playback clock; how late a frame
+		## went up is what an artist sees as stutter
+		if not self.enabled:
+			return
+
+		late_ms = (actual_ns - intended_ns) / 1_000_000
+		now_us = self.now_us()
+
+		with self.lock:
+			self.dropped_frames += dropped
+			self.presentations.append((now_us, late_ms))
+			self.events.append({"name": "present", "cat": "playback", "ph": "i", "s": "p", "ts": now_us,
+							"pid": os.getpid(), "tid": threading.get_ident(),
+							"args": {"frame": index, "late_ms": late_ms, "dropped": dropped}})
+			self.events.append({"name": "playback", "ph": "C", "ts": now_us, "pid": os.getpid(),
+							"args": {"late_ms": late_ms, "dropped_total": self.dropped_frames}})
+
+	def record_counter(self, name, values):
+		if not self.enabled:
+			return
+
+		with self.lock:
+			self.events.append({"name": name, "ph": "C", "ts": self.now_us(), "pid": os.getpid(), "args": values})
+
+	def average_ms(self, name):
+		with self.lock:
+			durations = list(self.recent.get(name, ()))
+		return sum(durations) / len(durations) / 1000 if durations else 0.0
+
+	def snapshot(self):
+		with self.lock:
+			presentations = list(self.presentations)
+			dropped_frames = self.dropped_frames
+
+		fps = 0.0
+		
+		if len(presentations) > 1:
+			fps = (len(presentations) - 1) / ((presentations[-1][0] - presentations[0][0]) / 1_000_000)
+
+		late = [late_ms for _, late_ms in presentations]
+
+		return {
+			"fps": fps,
+			"late_avg_ms": sum(late) / len(late) if late else 0.0,
+			"late_max_ms": max(late, default = 0.0),
+			"dropped_frames": dropped_frames,
+			"decode_ms": self.average_ms("decode"),
+			"scale_ms": self.average_ms("scale"),
+			"compose_ms": self.average_ms("compose"),
+			"display_ms": self.average_ms("display")
+		}
+
+	def dump_chrome_trace(self, path):
+		## Chrome trace-event format; opens in chrome://tracing or Perfetto
+		with self.lock:
+			events = list(self.events)
+
+		with open(path, "w") as trace:
+			json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace)
+
+## one shared recorder, so hooks deep in the compose path (including the
+## worker threads) don't need it threaded through to them
+telemetry = Telemetry()
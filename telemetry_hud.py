@@ -0,0 +1,58 @@
+from PySide6.QtWidgets import QLabel
+from PySide6.QtCore import Qt, QTimer
+
+## local
+from telemetry import telemetry
+
+class TelemetryHud(QLabel):
+	def __init__(self, parent, stats_sources):
+		super().__init__(parent)
+		## stats_sources maps a label to a callable returning a stats() dict
+		self.stats_sources = stats_sources
+		self.setAttribute(Qt.WA_TransparentForMouseEvents)
+		self.setStyleSheet("QLabel { background-color: rgba(0, 0, 0, 160); color: #7CFC00;"
+						" font-family: monospace; padding: 6px; }")
+		self.move(8, 8)
+		self.hide()
+
+		self.timer = QTimer(self)
+		self.timer.setInterval(250)
+		self.timer.timeout.connect(self.refresh)
+
+	def toggle(self):
+		telemetry.enabled = not telemetry.enabled
+		
+		if telemetry.enabled:
+			self.refresh()
+			self.show()
+			self.raise_()
+			self.timer.start()
+		else:
+			self.timer.stop()
+			self.hide()
+
+	def refresh(self):
+		snapshot = telemetry.snapshot()
+		lines = [
+			f"fps       {snapshot['fps']:7.2f}",
+			f"late      {snapshot['late_avg_ms']:7.2f} ms avg  {snapshot['late_max_ms']:7.2f} ms max",
+			f"dropped   {snapshot['dropped_frames']:7d}",
+			f"decode    {snapshot['decode_ms']:7.2f} ms",
+			f"scale     {snapshot['scale_ms']:7.2f} ms",
+			f"compose   {snapshot['compose_ms']:7.2f} ms",
+			f"display   {snapshot['display_ms']:7.2f} ms"
+		]
+
+		for name, stats in self.stats_sources.items():
+			source_stats = stats()
+
+			if source_stats is None:
+				continue
+
+			if "hit_rate" in source_stats:
+				lines.append(f"{name:9} {source_stats['hit_rate'] * 100:6.1f}% hits")
+			elif "stall_rate" in source_stats:
+				lines.append(f"{name:9} {source_stats['stall_rate'] * 100:6.1f}% stalls")
+
+		self.setText("\n".join(lines))
+		self.adjustSize()
@@ -0,0 +1,156 @@
+## Python standard
+import bisect
+
+MODES = ("forward", "reverse", "bounce")
+
+class Timeline:
+	def __init__(self, frame_count, framehold = 1, holds = None, segments = None):
+		## maps output frame numbers to source frames without ever expanding
+		## the sequence; segments are (first, last, mode, loops): a range of
+		## source frames played forward, reversed or bouncing (there and back,
+		## ending where it started), loops times over; each source frame is
+		## held for framehold output frames unless holds overrides it
+		self.frame_count = frame_count
+		self.framehold = framehold
+		self.holds = dict(holds or {})
+
+		if segments is None:
+			segments = [(0, frame_count - 1, "forward", 1)] if frame_count else []
+
+		self.segments = list(segments)
+
+		for first, last, mode, loops in self.segments:
+			if not 0 <= first <= last < frame_count or mode not in MODES or loops < 1:
+				raise ValueError(f"Bad timeline segment: {(first, last, mode, loops)}")
+
+		## with hold overrides, a running total of the holds lets a lookup
+		## bisect; without any, every lookup is arithmetic
+		self.hold_starts = None
+
+		if self.holds:
+			self.hold_starts = [0]
+
+			for index in range(frame_count):
+				self.hold_starts.append(self.hold_starts[-1] + self.hold(index))
+
+		self.segment_starts = [0]
+
+		for segment in self.segments:
+			self.segment_starts.append(self.segment_starts[-1] + self.segment_frames(segment))
+
+		self.total_frames = self.segment_starts[-1]
+
+	def __len__(self):
+		return self.total_frames
+
+	def hold(self, index):
+		return self.holds.get(index, self.framehold)
+
+	def span(self, first, last):
+		## output frames for source frames first..last, played once
+		if last < first:
+			return 0
+
+		if self.hold_starts is None:
+			return (last - first + 1) * self.framehold
+		return self.hold_starts[last + 1] - self.hold_starts[first]
+
+	def segment_frames(self, segment):
+		first, last, mode, loops = segment
+
+		if mode != "bounce" or first == last:
+			return loops * self.span(first, last)
+
+		## the turnarounds aren't shown twice; the last pass comes home
+		return loops * (self.span(first, last) + self.span(first + 1, last - 1)) + self.hold(first)
+
+	def forward_step(self, first, offset):
+		## (source frame, end of its hold) offset frames into first, first + 1, ...
+		if self.hold_starts is None:
+			step = offset // self.framehold
+			return first + step, (step + 1) * self.framehold
+
+		base = self.hold_starts[first]
+		source = bisect.bisect_right(self.hold_starts, base + offset) - 1
+		return source, self.hold_starts[source + 1] - base
+
+	def reverse_step(self, last, offset):
+		## the same, offset frames into last, last - 1, ...
+		if self.hold_starts is None:
+			step = offset // self.framehold
+			return last - step, (step + 1) * self.framehold
+
+		base = self.hold_starts[last + 1]
+		source = bisect.bisect_left(self.hold_starts, base - offset) - 1
+		return source, base - self.hold_starts[source]
+
+	def segment_step(self, segment, offset):
+		first, last, mode, loops = segment
+		pass_frames = self.span(first, last)
+
+		if mode != "bounce" or first == last:
+			loop, offset = divmod(offset, pass_frames)
+			step = self.reverse_step if mode == "reverse" else self.forward_step
+			source, end = step(last if mode == "reverse" else first, offset)
+			return source, loop * pass_frames + end
+
+		cycle_frames = pass_frames + self.span(first + 1, last - 1)
+		loop, offset = divmod(offset, cycle_frames)
+
+		if loop == loops:
+			return first, loop * cycle_frames + self.hold(first)
+
+		if offset < pass_frames:
+			source, end = self.forward_step(first, offset)
+		else:
+			source, end = self.reverse_step(last - 1, offset - pass_frames)
+			end += pass_frames
+
+		return source, loop * cycle_frames + end
+
+	def locate(self, frame):
+		## (source frame, output frame its hold ends at) for an output frame
+		if not 0 <= frame < self.total_frames:
+			raise IndexError(f"Frame {frame} is outside the timeline")
+
+		index = bisect.bisect_right(self.segment_starts, frame) - 1
+		start = self.segment_starts[index]
+		source, end = self.segment_step(self.segments[index], frame - start)
+		return source, start + end
+
+	def source(self, frame):
+		return self.locate(frame)[0]
+
+	def runs(self, first_frame = 0, last_frame = None):
+		## (source frame, repeat) for output frames first_frame up to
+		## last_frame, one hold at a time
+		last_frame = self.total_frames if last_frame is None else min(last_frame, self.total_frames)
+		frame = first_frame
+
+		while frame < last_frame:
+			source, end = self.locate(frame)
+			end = min(end, last_frame)
+			yield source, end - frame
+			frame = end
+
+	def first_frame(self, source):
+		## the first output frame showing a source frame, or None
+		for (first, last, mode, _), start in zip(self.segments, self.segment_starts):
+			if first <= source <= last:
+				if mode == "reverse":
+					return start + self.span(source + 1, last)
+				return start + self.span(first, source - 1)
+
+		return None
+
+	def loop_frames(self):
+		## frames before a looping timeline repeats seamlessly: a bounce ends
+		## back on the frame the next time round starts with
+		if not self.total_frames:
+			return 0
+
+		last_source = self.source(self.total_frames - 1)
+
+		if last_source == self.source(0) and self.total_frames > self.hold(last_source):
+			return self.total_frames - self.hold(last_source)
+		return self.total_frames
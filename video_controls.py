@@ -1,8 +1,12 @@
 from PySide6.QtWidgets import QWidget, QHBoxLayout, QPushButton
-from PySide6.QtCore import Signal, QTimer, QSize
+from PySide6.QtCore import Qt, Signal, QTimer, QSize, QElapsedTimer
 from PySide6.QtGui import QIcon, QPixmap
 import os
 
+## local
+from telemetry import telemetry
+from timeline import Timeline
+
 class VideoControls(QWidget):
 	image_changed = Signal(int)
 
@@ -33,10 +37,21 @@ class VideoControls(QWidget):
 		self.is_looping = False
 		self.play_direction = 1
 		self.framehold = 1
-		self.frame_count = 0
 		self.fps = 24
 
+		## playback is scheduled against a monotonic clock: the frame to show
+		## is worked out from elapsed time, so timer jitter never accumulates
+		## and late ticks skip frames instead of slowing playback down; which
+		## drawing that frame is comes from the same timeline export uses
+		self.clock = QElapsedTimer()
+		self.timeline = Timeline(0)
+		self.start_frame = 0
+		self.frame_shown = 0
+		self.dropped_frames = 0
+
 		self.timer = QTimer(self)
+		self.timer.setTimerType(Qt.PreciseTimer)
+		self.timer.setSingleShot(True)
 		self.timer.timeout.connect(self.update_image)
 
 	def create_buttons(self):
@@ -44,9 +59,6 @@ class VideoControls(QWidget):
 		self.layout.addStretch()
 		
 		for name, (up_image, down_image, button_tooltip) in self.buttons.items():
-			up_image = self.resource_manager.get_resource_path(f"images/{up_image}")
-			down_image = self.resource_manager.get_resource_path(f"images/{down_image}")
-
 			button = QPushButton()
 			button.setCheckable(True)
 			button.setFixedSize(button_size)
@@ -67,22 +79,101 @@ class VideoControls(QWidget):
 		self.loop_button.clicked.connect(self.toggle_loop)
 
 	def set_button_icons(self, button, up_image, down_image):
-		icon = QIcon()
-		icon.addPixmap(QPixmap(os.path.join('images', up_image)), QIcon.Normal, QIcon.Off)
-		icon.addPixmap(QPixmap(os.path.join('images', down_image)), QIcon.Normal, QIcon.On)
-		button.setIcon(icon)
-		button.setIconSize(QPixmap(os.path.join('images', up_image)).size())
+		## icons come from the resource manager's cache, so flipping the
+		## loop button doesn't reload anything from disk
+		up_image, down_image = f"images/{up_image}", f"images/{down_image}"
+		button.setIcon(self.resource_manager.get_icon(up_image, down_image))
+		button.setIconSize(self.resource_manager.get_pixmap(up_image).size())
 
 	def set_total_images(self, total):
+		changed = total != self.total_images
 		self.total_images = total
 
+		## a longer list is a longer timeline
+		if changed and self.is_playing:
+			self.restart_clock()
+
 	def set_fps(self, fps):
 		self.fps = fps
-		self.timer.setInterval(1000 // self.fps)
+		self.restart_clock()
 
 	def set_framehold(self, framehold):
 		self.framehold = framehold
-		self.frame_count = 0
+		self.restart_clock()
+
+	def restart_clock(self):
+		self.clock.start()
+
+		if self.is_playing and self.total_images:
+			## pick up from the frame on screen; a run that has nothing left
+			## to play starts again from the top
+			self.timeline = self.playback_timeline()
+			image = min(self.current_image, self.total_images - 1)
+			self.start_frame = self.timeline.first_frame(image)
+
+			## a bounce carries on the way playback was going, so heading
+			## backwards it picks up on the way back
+			if self.is_bouncing and self.play_direction == -1 and 0 < image < self.total_images - 1:
+				self.start_frame = (self.timeline.span(0, self.total_images - 1)
+									+ self.timeline.span(image + 1, self.total_images - 2))
+
+			if not self.is_looping and not self.is_bouncing:
+				if self.timeline.locate(self.start_frame)[1] >= len(self.timeline):
+					self.start_frame = 0
+
+			self.frame_shown = self.start_frame
+			self.schedule_next_step()
+
+	def playback_timeline(self):
+		if self.is_bouncing:
+			mode = "bounce"
+		else:
+			mode = "forward" if self.play_direction == 1 else "reverse"
+
+		return Timeline(self.total_images, self.framehold, segments = [(0, self.total_images - 1, mode, 1)])
+
+	def frame_due(self):
+		## frames count on from start_frame without wrapping; wrap_frame
+		## brings them back onto the timeline
+		return self.start_frame + self.clock.nsecsElapsed() * self.fps // 1_000_000_000
+
+	def wrap_frame(self, frame):
+		## looping and bouncing playback go round and round the timeline
+		if self.is_looping or self.is_bouncing:
+			return frame % self.timeline.loop_frames()
+		return frame
+
+	def next_change(self, frame):
+		## the frame the drawing on screen at frame has been held long enough by
+		wrapped = self.wrap_frame(frame)
+		_, end = self.timeline.locate(wrapped)
+		return frame + end - wrapped
+
+	def schedule_next_step(self):
+		next_step_ns = (self.next_change(self.frame_shown) - self.start_frame) * 1_000_000_000 / self.fps
+		delay_ns = next_step_ns - self.clock.nsecsElapsed()
+		
+		## round up so the timer never fires before the frame is due
+		self.timer.start(max(0, -(-int(delay_ns) // 1_000_000)))
+
+	def upcoming_images(self, count):
+		## the next few drawings playback will show, for the prefetcher
+		images = []
+		frame = self.frame_shown
+
+		while len(images) < count:
+			frame = self.next_change(frame)
+
+			if self.wrap_frame(frame) >= len(self.timeline):
+				break
+
+			image = self.timeline.source(self.wrap_frame(frame))
+
+			if image in images:
+				break
+			images.append(image)
+
+		return images
 
 	def goto_start(self):
 		self.current_image = 0
@@ -101,7 +192,6 @@ class VideoControls(QWidget):
 		self.timer.stop()
 		self.is_playing = False
 		self.is_bouncing = False
-		self.frame_count = 0
 		self.play_forward_button.setChecked(False)
 		self.play_reverse_button.setChecked(False)
 		self.bounce_button.setChecked(False)
@@ -114,8 +204,7 @@ class VideoControls(QWidget):
 		if self.total_images:
 			self.is_playing = True
 			self.is_bouncing = False
-			self.frame_count = 0
-			self.timer.start()
+			self.restart_clock()
 			
 			if self.play_direction == 1:
 					self.play_forward_button.setChecked(True)
@@ -140,13 +229,20 @@ class VideoControls(QWidget):
 		else:
 			self.is_bouncing = True
 			self.is_playing = True
-			self.frame_count = 0
-			self.timer.start()
+			self.restart_clock()
 			self.bounce_button.setChecked(True)
 			self.play_forward_button.setChecked(False)
 			self.play_reverse_button.setChecked(False)
 
 	def toggle_loop(self):
+		## the frame count runs on past the end while looping; bring it back
+		## onto the timeline first, so turning looping off plays out the pass
+		## that's on screen rather than ending straight away
+		if self.is_playing and self.total_images:
+			wrapped = self.wrap_frame(self.frame_shown)
+			self.start_frame -= self.frame_shown - wrapped
+			self.frame_shown = wrapped
+
 		self.is_looping = not self.is_looping
 		self.loop_button.setChecked(self.is_looping)
 		if self.is_looping:
@@ -155,17 +251,40 @@ class VideoControls(QWidget):
 			self.set_button_icons(self.loop_button, 'loop_off_up.png', 'loop_off_down.png')
 
 	def update_image(self):
-		if self.is_playing:
-			self.frame_count += 1
-			if self.frame_count >= self.framehold:
-					self.frame_count = 0
-					if self.is_bouncing:
-						self.current_image += self.play_direction
-						if self.current_image >= self.total_images or self.current_image < 0:
-							self.play_direction *= -1
-							self.current_image += self.play_direction * 2
-					else:
-						self.current_image = (self.current_image + self.play_direction) % self.total_images
-						if self.current_image == 0 and not self.is_looping:
-							self.stop_playback()
-					self.image_changed.emit(self.current_image)
+		if not self.is_playing or not self.total_images:
+			return
+
+		due = self.frame_due()
+
+		## played through without looping: back to frame 1, and stop
+		if self.wrap_frame(due) >= len(self.timeline):
+			self.stop_playback()
+			self.current_image = 0
+			self.image_changed.emit(self.current_image)
+			return
+
+		## if rendering fell behind, jump straight to the frame that is due;
+		## any drawing whose hold began and ended in between was dropped
+		dropped = -1
+		frame = self.frame_shown
+
+		while frame <= due:
+			frame = self.next_change(frame)
+			dropped += 1
+
+		self.dropped_frames += max(0, dropped - 1)
+		self.frame_shown = due
+		self.current_image = self.timeline.source(self.wrap_frame(due))
+
+		## a bounce keeps track of which way it's heading
+		if self.is_bouncing:
+			on_way_back = self.wrap_frame(due) >= self.timeline.span(0, self.total_images - 1)
+			self.play_direction = -1 if on_way_back else 1
+		self.image_changed.emit(self.current_image)
+
+		if telemetry.enabled:
+			intended_ns = (due - self.start_frame) * 1_000_000_000 // self.fps
+			telemetry.record_presentation(self.current_image, intended_ns, self.clock.nsecsElapsed(),
+									max(0, dropped - 1))
+
+		self.schedule_next_step()
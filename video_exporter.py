@@ -0,0 +1,297 @@
+## Python standard
+import os
+import time
+import contextlib
+
+## PySide6
+from PySide6.QtCore import QThread, Signal
+
+## local
+from frame_composer import FrameComposer
+from frame_buffer import frame_array, rgba_image
+from log_capture import LogPipe, parse_progress
+from timeline import Timeline
+
+RESOLUTIONS = {
+	"720p": (1280, 720),
+	"1080p": (1920, 1080),
+	"4K": (3840, 2160),
+	"8K": (7680, 4320)
+}
+
+## draft renders are for watching straight away, not for keeping
+DRAFT_SIZE = (640, 360)
+DRAFT_PRESET = "veryfast"
+DRAFT_PARAMS = ["-tune", "animation"]
+
+## the most of ffmpeg's output an export error quotes
+ERROR_LINES = 12
+
+def write_frame(writer, frame, log_pipe = None):
+	## a 32-bit frame has no row padding, so the view goes to ffmpeg's stdin
+	## as it is; moviepy's write_frame would copy it with tobytes() first
+	try:
+		writer.proc.stdin.write(frame.data)
+	except IOError as error:
+		if log_pipe is None:
+			## let moviepy raise, with ffmpeg's own explanation of what went wrong
+			writer.write_frame(frame)
+			raise
+
+		## ffmpeg's stderr goes to the log pipe, not to moviepy, which has
+		## nothing to explain the failure with
+		raise IOError(encoder_error(writer, log_pipe)) from error
+
+def encoder_error(writer, log_pipe):
+	## the last lines ffmpeg wrote before it went, once they've all been
+	## drained into the log capture; ffmpeg logs at info level there, so the
+	## lines that report errors are picked out when there are any
+	writer.proc.wait()
+	log_pipe.close()
+	lines = [line for line in log_pipe.log_capture.getvalue().splitlines() if parse_progress(line) is None]
+	error_lines = [line for line in lines if "error" in line.lower()]
+	tail = "\n".join((error_lines or lines)[-ERROR_LINES:])
+	return f"ffmpeg stopped while writing {os.path.basename(writer.filename)}" + (f":\n{tail}" if tail else ".")
+
+def timeline_runs(image_files, timeline, first_frame = 0, last_frame = None):
+	## (image_path, repeat) for part of a timeline, worked out as they're written
+	for source, repeat in timeline.runs(first_frame, last_frame):
+		yield image_files[source], repeat
+
+def write_video(image_files, output_filename, width, height, fps, framehold,
+				progress_callback = None, writer_ready = None, composer = None, log_capture = None,
+				preset = "medium", ffmpeg_params = None, timeline = None):
+	## without a timeline, every drawing plays forward once, held for framehold
+	if timeline is None:
+		timeline = Timeline(len(image_files), framehold)
+
+	return write_frames(timeline_runs(image_files, timeline), output_filename, width, height, fps,
+					progress_callback, writer_ready, composer, log_capture, ffmpeg_params, preset, len(timeline))
+
+class ExportTarget:
+	def __init__(self, output_filename, width, height, fps = None, codec = "libx264", preset = "medium",
+				ffmpeg_params = None):
+		## one output of an export; with fps unset it plays at the export's
+		## own rate, otherwise the timeline is resampled to it
+		self.output_filename = output_filename
+		self.width = width
+		self.height = height
+		self.fps = fps
+		self.codec = codec
+		self.preset = preset
+		self.ffmpeg_params = ffmpeg_params
+
+def write_frames(frame_runs, output_filename, width, height, fps, progress_callback = None,
+				writer_ready = None, composer = None, log_capture = None, ffmpeg_params = None, preset = "medium",
+				total_frames = None):
+	target = ExportTarget(output_filename, width, height, preset = preset, ffmpeg_params = ffmpeg_params)
+	return write_outputs(frame_runs, [target], fps, progress_callback, writer_ready, composer, log_capture,
+						total_frames)
+
+## moviepy is imported on first export rather than at start-up; most
+## sessions never save a video and it's slow to import
+def write_outputs(frame_runs, targets, fps, progress_callback = None, writer_ready = None, composer = None,
+				log_capture = None, total_frames = None):
+	## frame_runs is an iterable of (image_path, repeat), usually read lazily
+	## off a timeline; a segment may start or end part way through a hold.
+	## Each drawing is decoded once and composed at every target's size, and
+	## each target has its own encoder process, so the targets all encode
+	## side by side off the one pass
+	from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+	if composer is None:
+		composer = FrameComposer()
+
+	if total_frames is None:
+		frame_runs = list(frame_runs)
+		total_frames = sum(repeat for _, repeat in frame_runs)
+
+	sizes = list(dict.fromkeys((target.width, target.height) for target in targets))
+	rates = [target.fps or fps for target in targets]
+	frames_written = 0
+
+	## with a log capture, the first encoder's status lines (frame, fps,
+	## bitrate) are drained into it; otherwise ffmpeg only reports errors
+	log_pipe = LogPipe(log_capture) if log_capture is not None else None
+
+	try:
+		with contextlib.ExitStack() as stack:
+			writers = []
+
+			## raw RGBA frames go straight to each ffmpeg's stdin; nothing is
+			## staged on disk and a held drawing is written by repeating the
+			## same buffer (withmask only switches ffmpeg's input to rgba, the
+			## fourth byte is ignored)
+			for target, rate in zip(targets, rates):
+				logfile = log_pipe.write_end if log_pipe is not None and not writers else None
+				writer = stack.enter_context(FFMPEG_VideoWriter(target.output_filename, (target.width, target.height),
+																rate, codec = target.codec, preset = target.preset,
+																withmask = True, logfile = logfile,
+																ffmpeg_params = target.ffmpeg_params))
+				writers.append(writer)
+
+				if writer_ready is not None:
+					writer_ready(writer)
+
+			if log_pipe is not None:
+				log_pipe.close_write_end()
+
+			frames = {}
+			frame_images = {}
+			previous_key = None
+
+			for image_path, repeat in frame_runs:
+				## a copy of the previous drawing is written again as a
+				## repeat, without composing it a second time; only runs of
+				## copies are caught here, a copy further on is composed again
+				## (from the composer's caches, when it has them)
+				content_key = tuple(composer.content_key(image_path, *size) for size in sizes)
+
+				if not frames or None in content_key or content_key != previous_key:
+					## each frame is a view of its image's pixels, so the images
+					## are kept until the next drawing replaces them
+					composed_images = composer.compose_sizes(image_path, sizes)
+					frame_images = {size: rgba_image(composed_image)
+									for size, composed_image in zip(sizes, composed_images)}
+					frames = {size: frame_array(frame_image) for size, frame_image in frame_images.items()}
+
+				previous_key = content_key
+
+				for _ in range(repeat):
+					for target, rate, writer in zip(targets, rates, writers):
+						## the export frames this one covers at the target's
+						## rate: the same frame twice, once, or not at all
+						copies = (-(-(frames_written + 1) * rate // fps)) - (-(-frames_written * rate // fps))
+
+						for _ in range(copies):
+							write_frame(writer, frames[(target.width, target.height)],
+										log_pipe if writer is writers[0] else None)
+
+					frames_written += 1
+
+					## ffmpeg reads stdin as it encodes, so a frame written is
+					## (give or take its pipe buffer) a frame encoded
+					if progress_callback is not None and not progress_callback(frames_written, total_frames):
+						return False
+	finally:
+		if log_pipe is not None:
+			log_pipe.close()
+
+	return True
+
+class ExportWorker(QThread):
+	progress = Signal(int, int, float)
+	export_finished = Signal(str)
+	export_cancelled = Signal()
+	export_failed = Signal(str)
+	encoder_progress = Signal(int, float, str)
+
+	def __init__(self, image_files, output_filename, width, height, fps, framehold, composer = None,
+				log_capture = None, segments = 1, preset = "medium", ffmpeg_params = None, timeline = None,
+				extra_targets = None, parent = None):
+		super().__init__(parent)
+		self.image_files = list(image_files)
+		self.output_filename = output_filename
+		self.width = width
+		self.height = height
+		self.fps = fps
+		self.framehold = framehold
+		self.timeline = timeline if timeline is not None else Timeline(len(self.image_files), framehold)
+		self.composer = composer
+		self.log_capture = log_capture
+		self.segments = segments
+		self.preset = preset
+		self.ffmpeg_params = ffmpeg_params
+
+		## extra targets (a review copy alongside the master, say) are
+		## rendered in the same pass, off the same decoded frames
+		self.targets = [ExportTarget(output_filename, width, height, fps, preset = preset,
+									ffmpeg_params = ffmpeg_params)] + list(extra_targets or [])
+		self.cancelled = False
+		self.writers = []
+
+		## outputs this export has started writing, and when it began; only
+		## those are removed when it fails, and only if they've been written
+		## to since, so a good file from an earlier export is never lost
+		self.started_files = set()
+		self.started_at = 0.0
+		self.start_time = 0.0
+
+	def run(self):
+		self.start_time = time.monotonic()
+		self.started_at = time.time()
+
+		if self.log_capture is not None:
+			self.log_capture.add_listener(self.report_encoder_progress)
+
+		try:
+			## several targets share one pass over the frames; segmenting
+			## only splits up a single output
+			if len(self.targets) > 1:
+				completed = write_outputs(timeline_runs(self.image_files, self.timeline), self.targets, self.fps,
+										self.report_progress, self.set_writer, self.composer, self.log_capture,
+										len(self.timeline))
+			elif self.segments > 1:
+				## each segment's encoder runs in its own process, so there's no
+				## writer to kill on cancel; the segments stop at their next frame
+				from segment_export import write_segmented_video
+
+				self.started_files.add(self.output_filename)
+
+				disk_cache = self.composer.disk_cache if self.composer is not None else None
+				completed = write_segmented_video(self.image_files, self.output_filename, self.width, self.height,
+												self.fps, self.framehold, self.segments, self.report_progress,
+												disk_cache, self.timeline)
+			else:
+				completed = write_video(self.image_files, self.output_filename, self.width, self.height,
+									self.fps, self.framehold, self.report_progress, self.set_writer, self.composer,
+									self.log_capture, self.preset, self.ffmpeg_params, self.timeline)
+		except Exception as e:
+			completed = False
+
+			if not self.cancelled:
+				self.remove_partial_file()
+				self.export_failed.emit(str(e))
+				return
+		finally:
+			self.writers = []
+
+			if self.log_capture is not None:
+				self.log_capture.remove_listener(self.report_encoder_progress)
+
+		if completed and not self.cancelled:
+			self.export_finished.emit(self.output_filename)
+		else:
+			self.remove_partial_file()
+			self.export_cancelled.emit()
+
+	def set_writer(self, writer):
+		self.writers.append(writer)
+		self.started_files.add(writer.filename)
+
+	def report_progress(self, frames_written, total_frames):
+		elapsed = time.monotonic() - self.start_time
+		eta = elapsed / frames_written * (total_frames - frames_written)
+		self.progress.emit(frames_written, total_frames, eta)
+		return not self.cancelled
+
+	def report_encoder_progress(self, event):
+		## called on the log pipe's thread; the signal hands it to the GUI
+		self.encoder_progress.emit(event["frame"], event["fps"], event["bitrate"])
+
+	def cancel(self):
+		self.cancelled = True
+
+		## kill the encoders rather than waiting for them to drain their
+		## queues; the blocked write then fails and run() cleans up
+		for writer in list(self.writers):
+			if writer.proc is not None:
+				writer.proc.kill()
+
+	def remove_partial_file(self):
+		for output_filename in self.started_files:
+			try:
+				if os.path.getmtime(output_filename) >= self.started_at:
+					os.remove(output_filename)
+			except OSError:
+				pass